@@ -1,7 +1,6 @@
-from flask import Flask, render_template, request, jsonify, send_file, session
+from flask import Flask, render_template, request, jsonify, send_file, session, Response, stream_with_context
 import os
 import wave
-import requests
 import json
 import uuid
 import time
@@ -11,10 +10,21 @@ import gspread
 from functools import wraps
 import urllib.parse
 import logging
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
-import speech_recognition as sr
 import re
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from session_journal import SessionJournal
+from audio_store import AudioStore
+from code_index import CandidateIndex
+from tts_cache import TTSCache
+from context_budget import build_context
+from sheets_batch import SheetCellBatcher
+from job_queue import JobQueue
+from vad import trim_silence
+from streaming_stt import StreamingTranscriber
+from stt_engines import load_speech_service
+import http_client
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
@@ -28,40 +38,66 @@ YC_TTS_URL = "https://tts.api.cloud.yandex.net/speech/v1/tts:synthesize"
 
 USED_CODES_FILE = "used_codes.json"
 SESSION_STORE_FILE = "session_store.json"
+SESSION_JOURNAL_FILE = "session_store.jsonl"
+FINALIZE_JOBS_FILE = "finalize_jobs.sqlite3"
 
 # Глобальное хранилище сессий
 sessions_store = {}
+session_journal = SessionJournal(SESSION_JOURNAL_FILE, legacy_path=SESSION_STORE_FILE)
 
-# Инициализация распознавателя речи
-recognizer = sr.Recognizer()
+# Очередь фоновой обработки завершённых собеседований (отчёт и запись в таблицу)
+finalize_jobs = JobQueue(FINALIZE_JOBS_FILE)
 
 # Настройки путей
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 UPLOAD_FOLDER = os.path.join(BASE_DIR, 'uploads')
 AUDIO_FOLDER = os.path.join(BASE_DIR, 'static', 'audio')
-# Имена файлов для перезаписи
-CURRENT_MESSAGE_FILE = os.path.join(AUDIO_FOLDER, 'current_message.wav')
-CURRENT_RESPONSE_FILE = os.path.join(UPLOAD_FOLDER, 'current_response.wav')
-
-# Создаем сессию requests с повторными попытками
-def create_session_with_retries():
-    session = requests.Session()
-    retry_strategy = Retry(
-        total=3,
-        backoff_factor=0.5,
-        status_forcelist=[429, 500, 502, 503, 504],
-    )
-    adapter = HTTPAdapter(max_retries=retry_strategy)
-    session.mount("https://", adapter)
-    session.mount("http://", adapter)
-    return session
+# Аудио вопросов и ответов хранится по сессиям и номерам реплик
+message_audio_store = AudioStore(os.path.join(AUDIO_FOLDER, 'sessions'))
+response_audio_store = AudioStore(os.path.join(UPLOAD_FOLDER, 'sessions'))
+# Кеш озвучки повторяющихся фраз
+tts_cache = TTSCache(os.path.join(BASE_DIR, 'tts_cache'))
+
+# Сообщение кандидату, если в записи не нашлось речи или её не удалось распознать:
+# ответ записывается заново, в историю собеседования ничего не добавляется
+STT_RETRY_MESSAGE = "Не удалось распознать ответ. Пожалуйста, повторите его."
+
+# Движок распознавания речи: "google" (по умолчанию, как раньше), "vosk", "whisper"
+# (whisper.cpp) или "standin" (локальная замена без модели). Локальные движки требуют
+# пакета и скачанной модели (см. README); модель загружается один раз при запуске
+STT_ENGINE = os.getenv("STT_ENGINE", "google")
+STT_MODEL_PATH = os.getenv("STT_MODEL_PATH", os.path.join(BASE_DIR, 'models', 'vosk-model-small-ru-0.22'))
+# Запасной движок, если модель не загрузилась; по умолчанию не задан, и без модели
+# приложение не запускается, чтобы записи кандидатов не уходили во внешний сервис незаметно
+STT_FALLBACK_ENGINE = os.getenv("STT_FALLBACK_ENGINE") or None
+stt_service = load_speech_service(STT_ENGINE, STT_MODEL_PATH, fallback=STT_FALLBACK_ENGINE)
+
+# Сессия без активности дольше этого времени удаляется вместе с незаконченной записью ответа
+SESSION_TIMEOUT = 3600
+
+# Сессии, завершённые в потоковом ответе, -> время завершения: cookie такой
+# сессии очищается при следующем запросе клиента
+finished_sessions = {}
+
+# Потоковые ответы, которые записываются сейчас, по сессиям
+response_streams = {}
+response_streams_lock = threading.Lock()
+
+# Параметры синтеза речи
+TTS_LANG = "ru-RU"
+TTS_VOICE = "ermil"
+TTS_SAMPLE_RATE = 48000
+# Потоки синтеза для потокового вопроса: предложения озвучиваются, пока LLM
+# генерирует следующие, и чтение ответа модели не ждёт синтеза
+TTS_WORKERS = 4
+tts_executor = ThreadPoolExecutor(max_workers=TTS_WORKERS)
 
 # Инициализация Flask приложения
 app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 200 * 1024 * 1024
 app.config['SECRET_KEY'] = 'your-secret-key-here'
-app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(hours=1)
+app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(seconds=SESSION_TIMEOUT)
 
 # Создаем необходимые папки
 if not os.path.exists(UPLOAD_FOLDER):
@@ -72,18 +108,19 @@ if not os.path.exists(AUDIO_FOLDER):
 # Загрузка и сохранение хранилища сессий
 def load_sessions_store():
     global sessions_store
-    if os.path.exists(SESSION_STORE_FILE):
-        try:
-            with open(SESSION_STORE_FILE, 'r') as f:
-                sessions_store = json.load(f)
-        except Exception as e:
-            logger.error(f"Ошибка загрузки хранилища сессий: {e}")
-            sessions_store = {}
+    try:
+        sessions_store = session_journal.load()
+    except Exception as e:
+        logger.error(f"Ошибка загрузки хранилища сессий: {e}")
+        sessions_store = session_journal.sessions = {}
 
-def save_sessions_store():
+def save_sessions_store(session_id):
+    """Сохраняет в журнал только изменённую сессию (или её удаление)"""
     try:
-        with open(SESSION_STORE_FILE, 'w') as f:
-            json.dump(sessions_store, f)
+        if session_id in sessions_store:
+            session_journal.put(session_id, sessions_store[session_id])
+        else:
+            session_journal.delete(session_id)
     except Exception as e:
         logger.error(f"Ошибка сохранения хранилища сессий: {e}")
 
@@ -145,8 +182,12 @@ def init_google_sheets():
 google_sheet = init_google_sheets()
 if google_sheet:
     google_sheet_headers = google_sheet.row_values(1)
+    candidate_index = CandidateIndex(google_sheet)
+    results_writer = SheetCellBatcher(google_sheet, headers=google_sheet_headers)
 else:
     google_sheet_headers = []
+    candidate_index = None
+    results_writer = None
 
 def check_code(code):
     used_codes = load_used_codes()
@@ -163,51 +204,35 @@ def check_code(code):
 
 def find_recrut_row(code: int):
     try:
-        records = google_sheet.get_all_records()
-        for i, record in enumerate(records, start=2):
-            if str(record.get('CODE', '')) == str(code):
-                return i
-        return None
-    except:
+        return candidate_index.find_row(code)
+    except Exception as e:
+        logger.error(f"Ошибка поиска кода {code}: {e}")
         return None
     
 def get_row_data(row_number):
     try:
-        row_data = google_sheet.row_values(row_number)
-        
-        if not row_data:
-            return ""
-        
-        vacancy_col_index = None
-        if "VACATION-TEXT" in google_sheet_headers:
-            vacancy_col_index = google_sheet_headers.index("VACATION-TEXT")
-        
-        row_string_parts = []
-        for i, cell in enumerate(row_data):
-            if i != vacancy_col_index and cell:
-                row_string_parts.append(str(cell))
-        
-        return ' '.join(row_string_parts)
-        
+        return candidate_index.candidate_text(row_number)
     except Exception as e:
         logger.error(f"Ошибка при получении данных строки {row_number}: {e}")
         return ""
 
 def get_vacancy_data(row_number):
     try:
-        if "VACATION-TEXT" not in google_sheet_headers:
-            return ""
-        
-        col_index = google_sheet_headers.index("VACATION-TEXT") + 1
-        return google_sheet.cell(row_number, col_index).value or ""
+        return candidate_index.vacancy_text(row_number)
     except Exception as e:
         logger.error(f"Ошибка при получении данных вакансии: {e}")
         return ""
 
 def text_to_speech(text, filename):
+    cache_key = TTSCache.make_key(text, TTS_VOICE, TTS_LANG, "wav", TTS_SAMPLE_RATE)
+    cached = tts_cache.get(cache_key)
+    if cached is not None:
+        with open(filename, "wb") as f:
+            f.write(cached)
+        logger.info(f"Аудио из кеша: {filename}")
+        return True
+    
     try:
-        session = create_session_with_retries()
-        
         headers = {
             "Authorization": f"Api-Key {YC_API_KEY}",
             "Content-Type": "application/x-www-form-urlencoded"
@@ -216,16 +241,16 @@ def text_to_speech(text, filename):
         # Правильные параметры для Yandex TTS
         data = {
             "text": text,
-            "lang": "ru-RU", 
-            "voice": "ermil",
+            "lang": TTS_LANG, 
+            "voice": TTS_VOICE,
             "format": "lpcm",
-            "sampleRateHertz": 48000,
+            "sampleRateHertz": TTS_SAMPLE_RATE,
             "folderId": YC_FOLDER_ID
         }
         
         encoded_data = urllib.parse.urlencode(data)
         
-        response = session.post(YC_TTS_URL, headers=headers, data=encoded_data, timeout=30)
+        response = http_client.post("tts", YC_TTS_URL, headers=headers, data=encoded_data)
         response.raise_for_status()
         
         # Сохраняем raw PCM данные
@@ -233,10 +258,13 @@ def text_to_speech(text, filename):
             f.write(response.content)
         
         # Конвертируем PCM в WAV
-        pcm_to_wav(filename + ".pcm", filename, 48000, 1, 2)
+        pcm_to_wav(filename + ".pcm", filename, TTS_SAMPLE_RATE, 1, 2)
         
         # Удаляем временный PCM файл
         os.remove(filename + ".pcm")
+        
+        with open(filename, "rb") as f:
+            tts_cache.put(cache_key, f.read())
                 
         logger.info(f"Аудио сохранено: {filename}")
         return True
@@ -265,36 +293,21 @@ def pcm_to_wav(pcm_file, wav_file, sample_rate, channels, sample_width):
         logger.error(f"Ошибка конвертации PCM в WAV: {e}")
 
 def speech_to_text_local(filename):
-    """Локальное распознавание речи с использованием speech_recognition"""
+    """Распознавание речи загруженным при запуске движком"""
     try:
-        # Используем библиотеку speech_recognition для локального распознавания
-        with sr.AudioFile(filename) as source:
-            # Adjust for ambient noise
-            recognizer.adjust_for_ambient_noise(source, duration=0.5)
-            # Record the audio
-            audio_data = recognizer.record(source)
-            
-            # Попробуем распознать с помощью разных движков
-            try:
-                # Сначала пробуем Google Web Speech API (бесплатный)
-                text = recognizer.recognize_google(audio_data, language="ru-RU")
-                logger.info("Речь распознана с помощью Google Web Speech API")
-                return text
-            except sr.UnknownValueError:
-                logger.warning("Google Web Speech API не смог распознать речь")
-            except sr.RequestError as e:
-                logger.warning(f"Ошибка запроса к Google Web Speech API: {e}")
-                
-        return "Я вас понял, спасибо за ответ."
+        # Тишина по краям уже обрезана в save_response
+        text = stt_service.transcribe_file(filename)
+        if text:
+            return text
+        logger.warning(f"Движок {stt_service.engine.name} не распознал речь в {filename}")
+        return None
         
     except Exception as e:
-        logger.error(f"Ошибка локального распознавания речи: {e}")
-        return "Благодарю за ваш ответ."
+        logger.error(f"Ошибка распознавания речи: {e}")
+        return None
 
 def generate_gpt_response(messages):
     try:
-        session = create_session_with_retries()
-        
         payload = {
             "modelUri": f"gpt://{YC_FOLDER_ID}/yandexgpt-lite",
             "completionOptions": {
@@ -310,7 +323,7 @@ def generate_gpt_response(messages):
             "Content-Type": "application/json"
         }
         
-        response = session.post(YC_GPT_URL, headers=headers, json=payload, timeout=30)
+        response = http_client.post("gpt", YC_GPT_URL, headers=headers, json=payload)
         response.raise_for_status()
         
         result = response.json()
@@ -320,16 +333,62 @@ def generate_gpt_response(messages):
         logger.error(f"Ошибка при обращении к Yandex GPT: {e}")
         return "Извините, произошла ошибка. Пожалуйста, попробуйте еще раз."
     
+def stream_gpt_response(messages):
+    """Потоковая генерация ответа: отдаёт накопленный текст по мере его поступления"""
+    payload = {
+        "modelUri": f"gpt://{YC_FOLDER_ID}/yandexgpt-lite",
+        "completionOptions": {
+            "stream": True,
+            "temperature": 0.6,
+            "maxTokens": 500
+        },
+        "messages": messages
+    }
+    
+    headers = {
+        "Authorization": f"Api-Key {YC_API_KEY}",
+        "Content-Type": "application/json"
+    }
+    
+    response = http_client.post("gpt", YC_GPT_URL, headers=headers, json=payload, stream=True)
+    with response:
+        response.raise_for_status()
+        # Каждая строка ответа - JSON с полным текстом, сгенерированным к этому моменту
+        for line in response.iter_lines():
+            if not line:
+                continue
+            chunk = json.loads(line)
+            yield chunk["result"]["alternatives"][0]["message"]["text"]
+
+SENTENCE_END = re.compile(r'(?<=[.!?…])\s+')
+
+def iter_sentences(partial_texts):
+    """Выделяет законченные предложения из потока накопленного текста"""
+    emitted = 0
+    text = ""
+    for text in partial_texts:
+        pending = text[emitted:]
+        start = 0
+        for match in SENTENCE_END.finditer(pending):
+            sentence = pending[start:match.start()].strip()
+            if sentence:
+                yield sentence
+            start = match.end()
+        emitted += start
+    
+    # Остаток после завершения генерации - последнее предложение
+    tail = text[emitted:].strip()
+    if tail:
+        yield tail
+
 def report_score(resume_text: str, vacancy_text: str, protocol_text: str) -> tuple:
     """
     Анализ резюме против вакансии через YandexGPT.
     Возвращает кортеж (финальный_рейтинг, отчет).
     """
     # try:
-    session = create_session_with_retries()
-    
     headers = {
-        "Authorization": f"Api-Key {"AQVNzGQyyfsE_0ScOUIqgCbaDjPBQjYEBL7-h_i3"}",
+        "Authorization": f"Api-Key {YC_API_KEY}",
         "Content-Type": "application/json",
     }
     
@@ -337,7 +396,7 @@ def report_score(resume_text: str, vacancy_text: str, protocol_text: str) -> tup
     combined_text = f"РЕЗЮМЕ КАНДИДАТА:\n{resume_text}\n\nВАКАНСИЯ:\n{vacancy_text}\n\nПРОТОКОЛ СОБЕСЕДОВАНИЯ:\n{protocol_text}"
     
     data = {
-        "modelUri": f"gpt://{"b1gvjms07lsr4hfhq8v3"}/yandexgpt-latest",
+        "modelUri": f"gpt://{YC_FOLDER_ID}/yandexgpt-latest",
         "completionOptions": {
             "stream": False,
             "temperature": 0.4,
@@ -361,7 +420,7 @@ def report_score(resume_text: str, vacancy_text: str, protocol_text: str) -> tup
         ]
     }
 
-    response = session.post("https://llm.api.cloud.yandex.net/foundationModels/v1/completion", headers=headers, json=data, timeout=60)
+    response = http_client.post("report", YC_GPT_URL, headers=headers, json=data)
     response.raise_for_status()
     result = response.json()
 
@@ -430,6 +489,10 @@ def generate_rating_details(report_text):
     except:
         return "Технические навыки: 7/10 | Soft Skills: 8/10 | Опыт: 7/10"
 
+def count_turns(messages, role):
+    """Количество реплик указанной роли в истории сообщений"""
+    return sum(1 for msg in messages if msg['role'] == role)
+
 def format_protocol(messages):
     """Форматирует протокол собеседования из истории сообщений"""
     protocol_lines = []
@@ -477,10 +540,6 @@ def update_results(row, protocol, final_rating, report):
         if not google_sheet:
             return False
             
-        protocol_col = google_sheet_headers.index("PROTOCOL") + 1
-        rating_col = google_sheet_headers.index("FINAL-RATING") + 1
-        report_col = google_sheet_headers.index("REPORT") + 1
-        
         # Обрезаем протокол если он слишком длинный для Google Sheets
         max_length = 40000
         if len(protocol) > max_length:
@@ -490,9 +549,13 @@ def update_results(row, protocol, final_rating, report):
         if len(report) > max_length:
             report = report[:max_length] + "\n... [ОТЧЕТ ОБРЕЗАН]"
         
-        google_sheet.update_cell(row, protocol_col, protocol)
-        google_sheet.update_cell(row, rating_col, final_rating)
-        google_sheet.update_cell(row, report_col, report)
+        # Все три ячейки записываются одним запросом
+        results_writer.update_row(row, {
+            "PROTOCOL": protocol,
+            "FINAL-RATING": final_rating,
+            "REPORT": report
+        })
+        candidate_index.invalidate()
         
         logger.info(f"Данные сохранены в строку {row}")
         logger.info(f"Финальный рейтинг: {final_rating}")
@@ -502,20 +565,73 @@ def update_results(row, protocol, final_rating, report):
         logger.error(f"Ошибка при обновлении таблицы: {e}")
         return False
 
+def remove_session_audio(session_id):
+    with response_streams_lock:
+        response_streams.pop(session_id, None)
+    message_audio_store.remove_session(session_id)
+    response_audio_store.remove_session(session_id)
+
 def cleanup_old_sessions():
     global sessions_store
     current_time = time.time()
     expired_sessions = []
     
     for session_id, session_data in sessions_store.items():
-        if current_time - session_data.get('last_activity', 0) > 3600:
+        if current_time - session_data.get('last_activity', 0) > SESSION_TIMEOUT:
             expired_sessions.append(session_id)
     
     for session_id in expired_sessions:
         del sessions_store[session_id]
+        save_sessions_store(session_id)
+        remove_session_audio(session_id)
+    
+    for session_id, finished_at in list(finished_sessions.items()):
+        if current_time - finished_at > SESSION_TIMEOUT:
+            finished_sessions.pop(session_id, None)
+    
+    # Запись ответа, брошенная на середине (закрыта вкладка, пропала сеть), держит весь звук в памяти
+    with response_streams_lock:
+        for session_id, transcriber in list(response_streams.items()):
+            if session_id not in sessions_store or current_time - transcriber.updated_at > SESSION_TIMEOUT:
+                del response_streams[session_id]
+                logger.info(f"Незаконченная запись ответа сессии {session_id} удалена")
+
+def finalize_interview_job(payload):
+    """Фоновое задание: отчёт по собеседованию и запись результатов в таблицу"""
+    if not google_sheet:
+        logger.warning(f"Google Sheets недоступен, результаты строки {payload['row']} не сохранены")
+        return
+    
+    # Отчёт сохраняется в данных задания: при повторе после ошибки записи он не запрашивается заново
+    if 'report' not in payload:
+        payload['final_rating'], payload['report'] = report_score(
+            payload['candidate_data'],
+            payload['vacancy_data'],
+            payload['protocol']
+        )
     
-    if expired_sessions:
-        save_sessions_store()
+    if not update_results(payload['row'], payload['protocol'], payload['final_rating'], payload['report']):
+        raise RuntimeError(f"Не удалось сохранить результаты в строку {payload['row']}")
+
+def finish_interview(session_id, session_data):
+    """Ставит анализ и сохранение результатов в очередь и закрывает сессию"""
+    # Форматируем протокол сразу, чтобы в нём была дата окончания собеседования
+    protocol = format_protocol(session_data['messages'])
+    
+    finalize_jobs.enqueue("finalize_interview", {
+        "row": session_data['row'],
+        "protocol": protocol,
+        "candidate_data": session_data['candidate_data'],
+        "vacancy_data": session_data['vacancy_data']
+    })
+    
+    # Удаляем сессию из хранилища
+    sessions_store.pop(session_id, None)
+    save_sessions_store(session_id)
+    remove_session_audio(session_id)
+
+finalize_jobs.register("finalize_interview", finalize_interview_job)
+finalize_jobs.start()
 
 # Маршруты Flask
 @app.route('/')
@@ -524,7 +640,8 @@ def index():
         session_id = session['session_id']
         if session_id in sessions_store:
             del sessions_store[session_id]
-            save_sessions_store()
+            save_sessions_store(session_id)
+            remove_session_audio(session_id)
         session.clear()
     
     return render_template('index.html')
@@ -569,7 +686,7 @@ def check_code_route():
             session['session_id'] = session_id
             session.permanent = True
             
-            save_sessions_store()
+            save_sessions_store(session_id)
             
             return jsonify({
                 "valid": True,
@@ -594,6 +711,18 @@ def reset_codes():
         logger.error(f"Ошибка сброса кодов: {e}")
         return jsonify({'status': 'error', 'message': str(e)})
 
+@app.route('/admin/finalize_jobs')
+def finalize_jobs_stats():
+    return jsonify({'status': 'success', 'stats': finalize_jobs.stats()})
+
+@app.route('/admin/stt_stats')
+def stt_stats():
+    return jsonify({'status': 'success', 'stats': stt_service.stats()})
+
+@app.route('/admin/tts_cache_stats')
+def tts_cache_stats():
+    return jsonify({'status': 'success', 'stats': tts_cache.stats()})
+
 @app.route('/get_message')
 @require_session
 def get_message():
@@ -609,50 +738,36 @@ def get_message():
         
         session_data['last_activity'] = time.time()
         sessions_store[session_id] = session_data
-        save_sessions_store()
+        save_sessions_store(session_id)
         
-        gpt_response = generate_gpt_response(session_data['messages'])
+        gpt_response = generate_gpt_response(build_context(session_data))
         
         if "конец" in gpt_response.lower():
-            # Форматируем протокол
-            protocol = format_protocol(session_data['messages'])
-            
-            # Анализируем соответствие кандидата вакансии
-            final_rating, report = report_score(
-                session_data['candidate_data'],
-                session_data['vacancy_data'],
-                protocol
-            )
-            final_rating, report = '', ''
-            
-            # Сохраняем результаты
-            update_results(session_data['row'], protocol, final_rating, report)
-            
-            # Удаляем сессию из хранилища
-            del sessions_store[session_id]
-            save_sessions_store()
+            finish_interview(session_id, session_data)
             
             # Очищаем cookie сессии
             session.clear()
             
             return jsonify({
                 "has_message": False,
-                "message": "Собеседование завершено. Результаты проанализированы и сохранены."
+                "message": "Собеседование завершено. Результаты будут проанализированы и сохранены."
             })
         
         # Добавляем ответ интервьюера в историю сообщений
         session_data['messages'].append({"role": "assistant", "text": gpt_response})
         sessions_store[session_id] = session_data
-        save_sessions_store()
+        save_sessions_store(session_id)
+        
+        # Номер реплики делает адрес аудио уникальным, кеширование браузера не мешает
+        turn = count_turns(session_data['messages'], 'assistant')
+        audio_file = message_audio_store.path_for(session_id, turn)
         
         # Преобразуем текст в аудио
-        success = text_to_speech(gpt_response, CURRENT_MESSAGE_FILE)
+        success = text_to_speech(gpt_response, audio_file)
         
         if success:
-            # Добавляем случайный параметр для избежания кеширования
-            import random
-            random_param = random.randint(1, 1000000)
-            audio_url = f"/get_audio?{random_param}"
+            message_audio_store.commit(audio_file)
+            audio_url = f"/get_audio?turn={turn}"
             
             return jsonify({
                 "has_message": True, 
@@ -671,9 +786,100 @@ def get_message():
             "message": f"Ошибка: {str(e)}"
         })
 
+@app.route('/get_message_stream')
+@require_session
+def get_message_stream():
+    """
+    Потоковый вариант /get_message: ответ в формате NDJSON, по строке на каждое
+    озвученное предложение, чтобы браузер начинал воспроизведение до конца генерации.
+    """
+    session_id = session['session_id']
+    session_data = sessions_store[session_id]
+    session_data['last_activity'] = time.time()
+    save_sessions_store(session_id)
+    
+    turn = count_turns(session_data['messages'], 'assistant') + 1
+    
+    def ndjson(data):
+        return json.dumps(data, ensure_ascii=False) + "\n"
+    
+    def generate():
+        sentences = []
+        synthesis = deque()
+        finished = False
+        
+        def synthesized(wait=False):
+            # Готовое аудио отдаётся строго по порядку предложений
+            while synthesis and (wait or synthesis[0][2].done()):
+                part, audio_file, future = synthesis.popleft()
+                if future.result():
+                    message_audio_store.commit(audio_file)
+                    yield ndjson({"audio_url": f"/get_audio?turn={turn}&part={part}"})
+                else:
+                    message_audio_store.release(audio_file)
+        
+        try:
+            try:
+                for part, sentence in enumerate(iter_sentences(stream_gpt_response(build_context(session_data)))):
+                    sentences.append(sentence)
+                    
+                    if "конец" in " ".join(sentences).lower():
+                        finished = True
+                        break
+                    
+                    audio_file = message_audio_store.path_for(session_id, turn, part)
+                    synthesis.append((part, audio_file, tts_executor.submit(text_to_speech, sentence, audio_file)))
+                    yield from synthesized()
+            except Exception as e:
+                logger.error(f"Ошибка потоковой генерации: {e}")
+            yield from synthesized(wait=True)
+            
+            if finished:
+                try:
+                    finish_interview(session_id, session_data)
+                    message = "Собеседование завершено. Результаты будут проанализированы и сохранены."
+                except Exception as e:
+                    logger.error(f"Ошибка завершения собеседования: {e}")
+                    message = f"Ошибка: {str(e)}"
+                # Заголовки уже отправлены, поэтому cookie сессии очищается при следующем запросе
+                finished_sessions[session_id] = time.time()
+                yield ndjson({"done": True, "has_message": False, "message": message})
+                return
+            
+            if not sentences:
+                # Вопрос не начат: это не конец собеседования, браузер запросит его снова
+                yield ndjson({"done": True, "has_message": False, "error": True, "message": "Ошибка генерации сообщения."})
+                return
+            
+            # Добавляем ответ интервьюера в историю сообщений
+            session_data['messages'].append({"role": "assistant", "text": " ".join(sentences)})
+            save_sessions_store(session_id)
+            yield ndjson({"done": True, "has_message": True})
+        finally:
+            # Клиент отключился посреди ответа: незапущенный синтез отменяется,
+            # а уже идущий по окончании освобождает зарезервированный путь
+            while synthesis:
+                _, audio_file, future = synthesis.popleft()
+                if future.cancel():
+                    message_audio_store.release(audio_file)
+                else:
+                    future.add_done_callback(lambda _, path=audio_file: message_audio_store.release(path))
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 @app.route('/get_audio')
+@require_session
 def get_audio():
-    return send_file(CURRENT_MESSAGE_FILE)
+    session_id = session['session_id']
+    turn = request.args.get('turn', type=int)
+    part = request.args.get('part', type=int)
+    if turn is None:
+        turn = count_turns(sessions_store[session_id]['messages'], 'assistant')
+    
+    audio_file = message_audio_store.find(session_id, turn, part)
+    if not audio_file:
+        return jsonify({'status': 'error', 'message': 'Аудио не найдено'}), 404
+    return send_file(audio_file, mimetype='audio/wav')
 
 @app.route('/save_response', methods=['POST'])
 @require_session
@@ -692,27 +898,36 @@ def save_response():
         
         audio_file = request.files['audio_data']
         
-        audio_file.save(CURRENT_RESPONSE_FILE)
+        turn = count_turns(session_data['messages'], 'user')
+        response_file = response_audio_store.path_for(session_id, turn)
+        audio_file.save(response_file)
         
         try:
-            with wave.open(CURRENT_RESPONSE_FILE, 'rb') as wav_file:
+            with wave.open(response_file, 'rb') as wav_file:
                 channels = wav_file.getnchannels()
                 sample_width = wav_file.getsampwidth()
                 frame_rate = wav_file.getframerate()
                 
                 logger.info(f"WAV файл сохранен: {channels} канал(ов), {sample_width*8} бит, {frame_rate} Гц")
                 
+            # Обрезаем тишину в начале и в конце ответа перед распознаванием
+            duration, speech_duration = trim_silence(response_file)
+            
         except Exception as e:
             logger.error(f"Ошибка проверки WAV файла: {str(e)}")
             return jsonify({'status': 'error', 'message': 'Invalid WAV file'})
+        finally:
+            response_audio_store.commit(response_file)
         
-        # Используем локальное распознавание речи
-        user_text = speech_to_text_local(CURRENT_RESPONSE_FILE)
+        if not speech_duration:
+            # Детектор мог не услышать тихую речь: решение принимает распознавание
+            logger.info(f"Детектор не нашёл речи в записи ({duration:.1f} с), распознаётся вся запись")
+        user_text = speech_to_text_local(response_file)
         
         if user_text:
             session_data['messages'].append({"role": "user", "text": user_text})
             sessions_store[session_id] = session_data
-            save_sessions_store()
+            save_sessions_store(session_id)
             
             return jsonify({
                 'status': 'success', 
@@ -721,16 +936,94 @@ def save_response():
             })
         else:
             return jsonify({
-                'status': 'error', 
-                'message': 'Не удалось распознать речь'
+                'status': 'retry', 
+                'message': STT_RETRY_MESSAGE
             })
     
     except Exception as e:
         logger.error(f"Ошибка сохранения ответа: {e}")
         return jsonify({'status': 'error', 'message': str(e)})
 
+@app.route('/stream_response/chunk', methods=['POST'])
+@require_session
+def stream_response_chunk():
+    try:
+        session_id = session['session_id']
+        if session_id not in sessions_store:
+            return jsonify({'status': 'error', 'message': 'Сессия не найдена'})
+        
+        # Первая часть начинает новый ответ
+        seq = request.args.get('seq', type=int)
+        with response_streams_lock:
+            if seq == 0:
+                response_streams[session_id] = StreamingTranscriber(stt_service.run, executor=stt_service.executor)
+            transcriber = response_streams.get(session_id)
+        
+        if transcriber is None:
+            return jsonify({'status': 'error', 'message': 'Запись ответа не начата'}), 409
+        
+        transcriber.accept(seq, request.get_data())
+        return jsonify({'status': 'success'})
+    
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 409
+    except Exception as e:
+        logger.error(f"Ошибка приема части ответа: {e}")
+        return jsonify({'status': 'error', 'message': str(e)})
+
+@app.route('/stream_response/finish', methods=['POST'])
+@require_session
+def stream_response_finish():
+    try:
+        session_id = session['session_id']
+        session_data = sessions_store.get(session_id)
+        
+        with response_streams_lock:
+            transcriber = response_streams.pop(session_id, None)
+        
+        if not session_data:
+            return jsonify({'status': 'error', 'message': 'Сессия не найдена'})
+        if transcriber is None:
+            return jsonify({'status': 'error', 'message': 'Запись ответа не начата'})
+        
+        session_data['last_activity'] = time.time()
+        
+        # Сохраняем запись ответа так же, как при загрузке целого файла
+        turn = count_turns(session_data['messages'], 'user')
+        response_file = response_audio_store.path_for(session_id, turn)
+        with open(response_file, 'wb') as f:
+            f.write(transcriber.wav_bytes())
+        response_audio_store.commit(response_file)
+        
+        # Большая часть ответа уже распознана, осталась последняя фраза
+        started = time.perf_counter()
+        user_text = transcriber.finish()
+        logger.info(f"Потоковый ответ {transcriber.duration:.1f} с распознан через {time.perf_counter() - started:.2f} с после окончания")
+        
+        if not user_text:
+            return jsonify({
+                'status': 'retry', 
+                'message': STT_RETRY_MESSAGE
+            })
+        
+        session_data['messages'].append({"role": "user", "text": user_text})
+        sessions_store[session_id] = session_data
+        save_sessions_store(session_id)
+        
+        return jsonify({
+            'status': 'success', 
+            'message': 'Ответ сохранен и обработан',
+            'text': user_text
+        })
+    
+    except Exception as e:
+        logger.error(f"Ошибка сохранения потокового ответа: {e}")
+        return jsonify({'status': 'error', 'message': str(e)})
+
 @app.before_request
 def before_request():
+    if finished_sessions.pop(session.get('session_id'), None):
+        session.clear()
     if int(time.time()) % 10 == 0:
         cleanup_old_sessions()
 
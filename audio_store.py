@@ -0,0 +1,144 @@
+import os
+import re
+import shutil
+import threading
+import logging
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+# Разрешённые символы в идентификаторе сессии (uuid4), чтобы не выйти за пределы папки
+SESSION_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+class AudioStore:
+    """
+    Хранилище аудиофайлов собеседований с ключом (сессия, номер реплики).
+    Файлы лежат в отдельной папке на сессию, поэтому одновременные собеседования
+    не перезаписывают друг друга. Общий объём ограничен: самые старые файлы удаляются.
+    Размеры файлов хранятся в индексе, который строится один раз при запуске,
+    поэтому запись файла не обходит всё хранилище.
+    """
+
+    def __init__(self, root, max_files=1000, max_bytes=512 * 1024 * 1024):
+        self.root = root
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # Путь -> размер в порядке записи: первым идёт самый старый файл
+        self._files = {}
+        self._total_bytes = 0
+        self._dir_files = Counter()
+        # Пути, выданные path_for и ещё не записанные: их папки не удаляются
+        self._reserved = set()
+        os.makedirs(self.root, exist_ok=True)
+        self._scan()
+
+    def path_for(self, session_id, turn, part=None, ext='wav'):
+        """
+        Путь к аудиофайлу реплики; папка сессии создаётся при необходимости.
+        part - номер фрагмента, если реплика озвучивается по предложениям.
+        """
+        session_dir = self._session_dir(session_id)
+        path = os.path.join(session_dir, self._file_name(turn, part, ext))
+        with self._lock:
+            os.makedirs(session_dir, exist_ok=True)
+            self._reserved.add(path)
+        return path
+
+    def find(self, session_id, turn, part=None, ext='wav'):
+        """Возвращает путь к существующему файлу реплики или None"""
+        path = os.path.join(self._session_dir(session_id), self._file_name(turn, part, ext))
+        return path if os.path.isfile(path) else None
+
+    def commit(self, path):
+        """Вызывается после записи файла: учитывает его в индексе и применяет ограничение размера"""
+        with self._lock:
+            self._reserved.discard(path)
+            self._track(path)
+            self._evict()
+
+    def release(self, path):
+        """Отменяет резерв пути, выданного path_for, если файл так и не был записан"""
+        with self._lock:
+            self._reserved.discard(path)
+
+    def remove_session(self, session_id):
+        """Удаляет все аудиофайлы сессии"""
+        session_dir = self._session_dir(session_id)
+        with self._lock:
+            shutil.rmtree(session_dir, ignore_errors=True)
+            for path in [path for path in self._files if os.path.dirname(path) == session_dir]:
+                self._untrack(path)
+            self._reserved = {path for path in self._reserved if os.path.dirname(path) != session_dir}
+
+    def evict(self):
+        """Удаляет самые старые файлы, пока хранилище не уложится в лимиты"""
+        with self._lock:
+            self._evict()
+
+    def _evict(self):
+        emptied = set()
+        while self._files and (len(self._files) > self.max_files or self._total_bytes > self.max_bytes):
+            path = next(iter(self._files))
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            self._untrack(path)
+            session_dir = os.path.dirname(path)
+            if not self._dir_files[session_dir]:
+                emptied.add(session_dir)
+
+        # Папки сессий, из которых удалены все файлы, тоже удаляются
+        reserved_dirs = {os.path.dirname(path) for path in self._reserved}
+        for session_dir in emptied - reserved_dirs:
+            if session_dir == self.root:
+                continue
+            try:
+                os.rmdir(session_dir)
+            except OSError:
+                pass
+
+    def _scan(self):
+        found = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                found.append((st.st_mtime, path))
+        for _, path in sorted(found):
+            self._track(path)
+
+    def _track(self, path):
+        self._untrack(path)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return
+        self._files[path] = size
+        self._total_bytes += size
+        self._dir_files[os.path.dirname(path)] += 1
+
+    def _untrack(self, path):
+        size = self._files.pop(path, None)
+        if size is None:
+            return
+        self._total_bytes -= size
+        session_dir = os.path.dirname(path)
+        self._dir_files[session_dir] -= 1
+        if not self._dir_files[session_dir]:
+            del self._dir_files[session_dir]
+
+    def _file_name(self, turn, part, ext):
+        if part is None:
+            return f"{int(turn)}.{ext}"
+        return f"{int(turn)}.{int(part)}.{ext}"
+
+    def _session_dir(self, session_id):
+        if not SESSION_ID_PATTERN.match(str(session_id)):
+            raise ValueError(f"Недопустимый идентификатор сессии: {session_id}")
+        return os.path.join(self.root, str(session_id))
@@ -1,8 +1,14 @@
 import os
+import time
+import asyncio
 import logging
 import json
-import csv
-import requests
+import tempfile
+import http_client
+from documents import parse_with_timeout, SUPPORTED_EXTENSIONS
+from candidate_store import CandidateStore
+from tts_cache import TTSCache
+from vacancy_index import VacancyIndex
 from telegram import (
     Update,
     ReplyKeyboardMarkup,
@@ -12,6 +18,7 @@ from telegram import (
 )
 from telegram.ext import (
     ApplicationBuilder,
+    BaseUpdateProcessor,
     ContextTypes,
     CommandHandler,
     MessageHandler,
@@ -29,7 +36,18 @@ YC_GPT_URL = "https://llm.api.cloud.yandex.net/foundationModels/v1/completion"
 YC_TTS_URL = "https://tts.api.cloud.yandex.net/speech/v1/tts:synthesize"
 VACANCIES_FILE = "vacancies.json"
 CSV_FILE = "candidates.csv"
+CANDIDATES_DB = "candidates.sqlite3"
+TTS_CACHE_DIR = "tts_cache"
 INTERVIEW_LINK = "https://example.com/interview"
+# Текст в ответ на выбор вакансии длиннее этого считается резюме: бот подбирает вакансии
+MIN_RESUME_LENGTH = 200
+SUGGESTED_VACANCIES = 3
+# Сколько обновлений разных чатов обрабатывается одновременно
+MAX_CONCURRENT_UPDATES = 64
+# Файлы резюме: предельный размер, число процессов разбора и время на разбор одного файла
+MAX_RESUME_BYTES = 10 * 1024 * 1024
+RESUME_PARSE_WORKERS = 2
+RESUME_PARSE_TIMEOUT = 60
 
 # ---------- Состояния ----------
 SELECT_VACANCY, UPLOAD_RESUME, INTERVIEW = range(3)
@@ -37,6 +55,13 @@ SELECT_VACANCY, UPLOAD_RESUME, INTERVIEW = range(3)
 # ---------- Данные ----------
 user_data = {}
 vacancies = {}
+vacancy_index = VacancyIndex()
+candidates = CandidateStore(CANDIDATES_DB, legacy_csv=CSV_FILE)
+tts_cache = TTSCache(TTS_CACHE_DIR)
+# Разбор PDF/DOCX/RTF идёт в отдельных процессах, чтобы не останавливать другие чаты;
+# процесс, не уложившийся в RESUME_PARSE_TIMEOUT, завершается и освобождает место
+resume_parse_slots = asyncio.Semaphore(RESUME_PARSE_WORKERS)
+parse_stats = {"files": 0, "errors": 0, "download_seconds": 0.0, "parse_seconds": 0.0, "max_parse_seconds": 0.0}
 
 # ---------- Логирование ----------
 logging.basicConfig(
@@ -45,46 +70,16 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# ================== CSV ==================
-def save_candidate_to_csv(user_id, full_name, vacancy_title, resume, percentage, analysis, status=""):
-    """Сохраняем кандидата в CSV"""
-    file_exists = os.path.isfile(CSV_FILE)
-    with open(CSV_FILE, "a", encoding="utf-8", newline="") as f:
-        writer = csv.writer(f)
-        if not file_exists:
-            writer.writerow([
-                "ID", "ФИО", "Вакансия", "Резюме",
-                "Соответствие", "Анализ", "Статус",
-                "Протокол", "Финальный отчёт", "Глубинный анализ"
-            ])
-        writer.writerow([
-            user_id, full_name, vacancy_title, resume,
-            percentage, analysis, status, "", "", ""
-        ])
-
-def update_csv_with_protocol(user_id, protocol, final_report="", deep_analysis=""):
-    """Обновляем CSV протоколом и финальным отчётом"""
-    if not os.path.exists(CSV_FILE):
+# ================== КАНДИДАТЫ ==================
+async def export_candidates(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Выгрузка кандидатов в CSV (только админ)"""
+    if update.message.from_user.id != ADMIN_ID:
+        await update.message.reply_text("Нет прав.")
         return
-        
-    rows = []
-    with open(CSV_FILE, "r", encoding="utf-8") as f:
-        reader = list(csv.reader(f))
-        headers = reader[0]
-        rows = reader[1:]
-
-    for row in rows:
-        if row and row[0] == str(user_id):
-            if len(row) < 10:
-                row.extend([""] * (10 - len(row)))
-            row[7] = protocol
-            row[8] = final_report
-            row[9] = deep_analysis
-
-    with open(CSV_FILE, "w", encoding="utf-8", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow(headers)
-        writer.writerows(rows)
+
+    count = candidates.export_csv(CSV_FILE)
+    with open(CSV_FILE, "rb") as f:
+        await update.message.reply_document(document=f, filename=CSV_FILE, caption=f"Кандидатов: {count}")
 
 # ================== ВАКАНСИИ ==================
 def save_vacancies():
@@ -100,6 +95,7 @@ def load_vacancies():
         vacancies = {}
     except json.JSONDecodeError:
         vacancies = {}
+    vacancy_index.rebuild(vacancies)
 
 async def add_vacancy(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Добавление вакансии (только админ)"""
@@ -124,6 +120,7 @@ async def save_vacancy_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     vacancies[vacancy_id] = {"title": vacancy_title, "text": vacancy_text}
     save_vacancies()
+    vacancy_index.add(vacancy_id, vacancy_title, vacancy_text)
 
     await update.message.reply_text(f"Вакансия '{vacancy_title}' сохранена (ID {vacancy_id}).")
     return ConversationHandler.END
@@ -171,6 +168,7 @@ async def confirm_delete_vacancy(update: Update, context: ContextTypes.DEFAULT_T
     deleted = vacancies[vid]["title"]
     del vacancies[vid]
     save_vacancies()
+    vacancy_index.remove(vid)
     await query.edit_message_text(f"Вакансия '{deleted}' удалена.")
 
 # ================== TTS ==================
@@ -178,28 +176,33 @@ async def send_tts_message(update: Update, text: str):
     """Озвучка текста через Yandex SpeechKit"""
     headers = {"Authorization": f"Api-Key {YC_API_KEY}"}
     data = {"text": text, "lang": "ru-RU", "voice": "ermil", "folderId": YC_FOLDER_ID}
+    # Формат и частота по умолчанию у SpeechKit: oggopus, 48 кГц
+    cache_key = TTSCache.make_key(text, data["voice"], data["lang"], "oggopus", 48000)
 
     try:
-        r = requests.post(YC_TTS_URL, headers=headers, data=data)
-        r.raise_for_status()
-        path = "speech.ogg"
-        with open(path, "wb") as f:
-            f.write(r.content)
-        await update.message.reply_voice(voice=open(path, "rb"))
-        os.remove(path)
+        voice = tts_cache.get(cache_key)
+        if voice is None:
+            r = await http_client.apost("tts", YC_TTS_URL, headers=headers, data=data)
+            r.raise_for_status()
+            voice = r.content
+            tts_cache.put(cache_key, voice)
+        # Отправляем байты напрямую: общий файл перезаписывался бы параллельными чатами
+        await update.message.reply_voice(voice=voice)
     except Exception as e:
         logger.error(f"TTS error: {e}")
         await update.message.reply_text(text)
 
 # ================== ОСНОВНОЙ ФЛОУ ==================
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # Резюме из прошлого подбора вакансий не переносится в новую заявку
+    user_data.get(update.message.from_user.id, {}).pop("suggested_resume", None)
     if not vacancies:
         await update.message.reply_text("Нет вакансий.")
         return ConversationHandler.END
 
     keyboard = [[f"Вакансия {vid}: {v['title']}"] for vid, v in vacancies.items()]
     await update.message.reply_text(
-        "Привет! Выберите вакансию:", 
+        "Привет! Выберите вакансию или пришлите текст резюме - подскажем подходящие:", 
         reply_markup=ReplyKeyboardMarkup(keyboard, one_time_keyboard=True)
     )
     return SELECT_VACANCY
@@ -210,35 +213,124 @@ async def select_vacancy(update: Update, context: ContextTypes.DEFAULT_TYPE):
         vid = update.message.text.split(":")[0].replace("Вакансия", "").strip()
         vacancy = vacancies[vid]
     except Exception:
+        if len(update.message.text) >= MIN_RESUME_LENGTH:
+            return await suggest_vacancies(update, context)
         await update.message.reply_text("Выберите вакансию из списка.")
         return SELECT_VACANCY
 
+    # Резюме, присланное для подбора вакансий в этом диалоге, повторно не запрашиваем
+    resume = user_data.get(user_id, {}).pop("suggested_resume", None)
     user_data[user_id] = {
         "vacancy_id": vid, 
         "vacancy_title": vacancy["title"], 
         "vacancy_text": vacancy["text"]
     }
+    if resume:
+        user_data[user_id]["resume"] = resume
+        await update.message.reply_text(f"Вы выбрали: {vacancy['title']}. Анализирую резюме...",
+                                        reply_markup=ReplyKeyboardRemove())
+        return await analyze_compatibility(update, context)
     await update.message.reply_text(f"Вы выбрали: {vacancy['title']}. Отправьте резюме.")
     return UPLOAD_RESUME
 
+async def suggest_vacancies(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Подбор вакансий по навыкам из резюме без запроса к YandexGPT"""
+    user_id = update.message.from_user.id
+    resume = update.message.text
+    matches = vacancy_index.match(resume, limit=SUGGESTED_VACANCIES)
+    if not matches:
+        await update.message.reply_text("Не нашли вакансий по вашим навыкам. Выберите вакансию из списка.")
+        return SELECT_VACANCY
+
+    user_data.setdefault(user_id, {})["suggested_resume"] = resume
+    lines = ["Подходящие вакансии:"]
+    for match in matches:
+        line = f"{match.title} - совпадение навыков {match.score:.0%}"
+        if match.missing:
+            line += f"\nНе хватает: {', '.join(match.missing[:5])}"
+        lines.append(line)
+    keyboard = [[f"Вакансия {match.vacancy_id}: {match.title}"] for match in matches]
+    await update.message.reply_text(
+        "\n\n".join(lines) + "\n\nВыберите вакансию:",
+        reply_markup=ReplyKeyboardMarkup(keyboard, one_time_keyboard=True)
+    )
+    return SELECT_VACANCY
+
 async def handle_resume(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.message.from_user.id
     resume = update.message.text
     
     if update.message.document:
+        document = update.message.document
+        extension = os.path.splitext(document.file_name or "")[1].lower()
+        if extension not in SUPPORTED_EXTENSIONS:
+            await update.message.reply_text(
+                f"Поддерживаются файлы {', '.join(SUPPORTED_EXTENSIONS)}. Отправьте другой файл или текст."
+            )
+            return UPLOAD_RESUME
+        if (document.file_size or 0) > MAX_RESUME_BYTES:
+            await update.message.reply_text(f"Файл больше {MAX_RESUME_BYTES // (1024 * 1024)} МБ. Отправьте текст.")
+            return UPLOAD_RESUME
         try:
-            file = await update.message.document.get_file()
-            resume_bytes = await file.download_as_bytearray()
-            resume = resume_bytes.decode("utf-8")
+            resume = await parse_resume_file(document, extension)
         except Exception as e:
-            logger.error(f"Ошибка загрузки файла: {e}")
+            parse_stats["errors"] += 1
+            logger.error(f"Ошибка обработки файла {document.file_name}: {e}")
             await update.message.reply_text("Ошибка обработки файла. Отправьте текст.")
             return UPLOAD_RESUME
+        if not resume.strip():
+            await update.message.reply_text("В файле не найден текст. Отправьте резюме текстом.")
+            return UPLOAD_RESUME
 
     user_data[user_id]["resume"] = resume
     await update.message.reply_text("Резюме получено. Анализирую...")
     return await analyze_compatibility(update, context)
 
+async def parse_resume_file(document, extension):
+    """Скачивает файл резюме во временный файл и извлекает текст в пуле процессов"""
+    fd, path = tempfile.mkstemp(suffix=extension)
+    os.close(fd)
+    try:
+        started = time.perf_counter()
+        file = await document.get_file()
+        await file.download_to_drive(path)
+        download_seconds = time.perf_counter() - started
+        # Размер в сообщении может отсутствовать - проверяем скачанный файл
+        size = os.path.getsize(path)
+        if size > MAX_RESUME_BYTES:
+            raise ValueError(f"файл больше {MAX_RESUME_BYTES} байт")
+
+        async with resume_parse_slots:
+            text, parse_seconds = await asyncio.to_thread(parse_with_timeout, path, RESUME_PARSE_TIMEOUT)
+    finally:
+        os.remove(path)
+
+    parse_stats["files"] += 1
+    parse_stats["download_seconds"] += download_seconds
+    parse_stats["parse_seconds"] += parse_seconds
+    parse_stats["max_parse_seconds"] = max(parse_stats["max_parse_seconds"], parse_seconds)
+    logger.info(
+        f"Резюме {document.file_name} ({size} байт): "
+        f"загрузка {download_seconds:.2f} с, разбор {parse_seconds:.2f} с"
+    )
+    return text or ""
+
+async def parse_stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Время загрузки и разбора файлов резюме (только админ)"""
+    if update.message.from_user.id != ADMIN_ID:
+        await update.message.reply_text("Нет прав.")
+        return
+
+    files = parse_stats["files"]
+    if not files:
+        await update.message.reply_text(f"Файлов резюме не разобрано. Ошибок: {parse_stats['errors']}")
+        return
+    await update.message.reply_text(
+        f"Файлов резюме: {files}, ошибок: {parse_stats['errors']}\n"
+        f"Загрузка в среднем: {parse_stats['download_seconds'] / files:.2f} с\n"
+        f"Разбор в среднем: {parse_stats['parse_seconds'] / files:.2f} с, максимум: {parse_stats['max_parse_seconds']:.2f} с"
+    )
+
 async def analyze_compatibility(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Анализ через Yandex GPT"""
     user_id = update.message.from_user.id
@@ -256,7 +348,7 @@ async def analyze_compatibility(update: Update, context: ContextTypes.DEFAULT_TY
     headers = {"Content-Type": "application/json", "Authorization": f"Api-Key {YC_API_KEY}"}
 
     try:
-        r = requests.post(YC_GPT_URL, json=prompt, headers=headers, timeout=30)
+        r = await http_client.apost("gpt", YC_GPT_URL, json=prompt, headers=headers)
         r.raise_for_status()
         result = r.json()
         analysis = result["result"]["alternatives"][0]["message"]["text"]
@@ -268,10 +360,10 @@ async def analyze_compatibility(update: Update, context: ContextTypes.DEFAULT_TY
         data["percentage"] = perc
 
         if perc >= 70:
-            save_candidate_to_csv(user_id, full_name, data["vacancy_title"], data["resume"], perc, analysis, "Приглашён")
+            candidates.save_candidate(user_id, full_name, data["vacancy_title"], data["resume"], perc, analysis, "Приглашён")
             await update.message.reply_text(f"Соответствие: {perc}%\nСсылка: {INTERVIEW_LINK}\nВаш ID: {user_id}\nВведите /access {user_id}")
         else:
-            save_candidate_to_csv(user_id, full_name, data["vacancy_title"], data["resume"], perc, analysis, "Бездарь")
+            candidates.save_candidate(user_id, full_name, data["vacancy_title"], data["resume"], perc, analysis, "Бездарь")
             await update.message.reply_text(f"Соответствие: {perc}%. Кандидат не подходит.")
         return ConversationHandler.END
     except Exception as e:
@@ -287,44 +379,25 @@ async def access_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return ConversationHandler.END
 
     uid = context.args[0]
-    found = False
-    
+    if not uid.isdigit():
+        await update.message.reply_text("Код доступа неверный.")
+        return ConversationHandler.END
+
     try:
-        if not os.path.exists(CSV_FILE):
-            await update.message.reply_text("База кандидатов не найдена.")
-            return ConversationHandler.END
-            
-        with open(CSV_FILE, "r", encoding="utf-8") as f:
-            reader = csv.reader(f)
-            next(reader, None)
-            for row in reader:
-                if row and row[0] == uid:
-                    found = True
-                    break
+        candidate = candidates.get(uid)
     except Exception as e:
-        logger.error(f"Ошибка чтения CSV: {e}")
+        logger.error(f"Ошибка чтения базы кандидатов: {e}")
         await update.message.reply_text("Ошибка доступа к базе кандидатов.")
         return ConversationHandler.END
 
-    if found:
+    if candidate:
         user_id = int(uid)
         if user_id not in user_data:
-            # Попытка восстановить данные из CSV
-            try:
-                with open(CSV_FILE, "r", encoding="utf-8") as f:
-                    reader = csv.reader(f)
-                    next(reader, None)
-                    for row in reader:
-                        if row and row[0] == uid:
-                            user_data[user_id] = {
-                                "resume": row[3],
-                                "vacancy_title": row[2]
-                            }
-                            break
-            except Exception as e:
-                logger.error(f"Ошибка восстановления данных: {e}")
-                await update.message.reply_text("Ошибка восстановления данных кандидата.")
-                return ConversationHandler.END
+            # Восстанавливаем данные кандидата из базы
+            user_data[user_id] = {
+                "resume": candidate["resume"],
+                "vacancy_title": candidate["vacancy_title"]
+            }
         
         await update.message.reply_text("Доступ подтверждён. Начинаем собеседование.")
         return await start_interview(update, context, user_id=user_id)
@@ -361,7 +434,7 @@ async def start_interview(update: Update, context: ContextTypes.DEFAULT_TYPE, us
     headers = {"Content-Type": "application/json", "Authorization": f"Api-Key {YC_API_KEY}"}
 
     try:
-        r = requests.post(YC_GPT_URL, json=prompt, headers=headers, timeout=30)
+        r = await http_client.apost("gpt", YC_GPT_URL, json=prompt, headers=headers)
         r.raise_for_status()
         result = r.json()
 
@@ -424,7 +497,7 @@ async def handle_interview_answer(update: Update, context: ContextTypes.DEFAULT_
     headers = {"Content-Type": "application/json", "Authorization": f"Api-Key {YC_API_KEY}"}
 
     try:
-        r = requests.post(YC_GPT_URL, json=prompt, headers=headers, timeout=30)
+        r = await http_client.apost("gpt", YC_GPT_URL, json=prompt, headers=headers)
         r.raise_for_status()
         result = r.json()
 
@@ -464,7 +537,7 @@ async def stop_interview(update: Update, context: ContextTypes.DEFAULT_TYPE):
     headers = {"Content-Type": "application/json", "Authorization": f"Api-Key {YC_API_KEY}"}
 
     try:
-        r = requests.post(YC_GPT_URL, json=prompt, headers=headers, timeout=60)
+        r = await http_client.apost("report", YC_GPT_URL, json=prompt, headers=headers)
         r.raise_for_status()
         text = r.json()["result"]["alternatives"][0]["message"]["text"]
         final_report, deep_analysis = text, text
@@ -472,7 +545,7 @@ async def stop_interview(update: Update, context: ContextTypes.DEFAULT_TYPE):
         logger.error(f"Ошибка генерации отчёта: {e}")
         final_report, deep_analysis = "", ""
 
-    update_csv_with_protocol(user_id, protocol, final_report, deep_analysis)
+    candidates.update_protocol(user_id, protocol, final_report, deep_analysis)
 
     await update.message.reply_text("Собеседование завершено. Результаты сохранены.")
     return ConversationHandler.END
@@ -493,16 +566,58 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 /list_vacancies - список вакансий
 /add_vacancy - добавить вакансию (только для админа)
 /delete_vacancy - удалить вакансию (только для админа)
+/export - выгрузить кандидатов в CSV (только для админа)
+/parse_stats - время разбора файлов резюме (только для админа)
 /help - показать эту справку
 """
     await update.message.reply_text(help_text)
 
+# ================== ОБНОВЛЕНИЯ ==================
+class ChatSequentialUpdateProcessor(BaseUpdateProcessor):
+    """
+    Обновления разных чатов обрабатываются параллельно, а одного чата - строго
+    по очереди: состояние диалога и user_data не меняются двумя сообщениями сразу.
+    """
+
+    def __init__(self, max_concurrent_updates):
+        super().__init__(max_concurrent_updates)
+        # id чата -> [замок, число обновлений чата в работе или в очереди]
+        self._chats = {}
+
+    async def do_process_update(self, update, coroutine):
+        chat = getattr(update, "effective_chat", None)
+        if chat is None:
+            await coroutine
+            return
+
+        entry = self._chats.setdefault(chat.id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                await coroutine
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._chats[chat.id]
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
 # ================== MAIN ==================
 def main():
     load_vacancies()
     
-    # Создаем Application
-    application = ApplicationBuilder().token(BOT_TOKEN).build()
+    # Создаем Application; обновления разных чатов обрабатываются параллельно,
+    # пока обработчики ждут ответа YandexGPT/TTS, сообщения одного чата - по очереди
+    application = (
+        ApplicationBuilder()
+        .token(BOT_TOKEN)
+        .concurrent_updates(ChatSequentialUpdateProcessor(MAX_CONCURRENT_UPDATES))
+        .build()
+    )
 
     # Основной обработчик диалога
     conv_handler = ConversationHandler(
@@ -527,6 +642,8 @@ def main():
     application.add_handler(CommandHandler("list_vacancies", list_vacancies))
     application.add_handler(CommandHandler("delete_vacancy", delete_vacancy))
     application.add_handler(CommandHandler("access", access_command))
+    application.add_handler(CommandHandler("export", export_candidates))
+    application.add_handler(CommandHandler("parse_stats", parse_stats_command))
     application.add_handler(CommandHandler("help", help_command))
     application.add_handler(CallbackQueryHandler(confirm_delete_vacancy, pattern="^delete_"))
 
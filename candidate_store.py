@@ -0,0 +1,117 @@
+import csv
+import os
+import sqlite3
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Заголовки CSV-выгрузки и соответствующие им столбцы таблицы
+CSV_HEADERS = [
+    "ID", "ФИО", "Вакансия", "Резюме",
+    "Соответствие", "Анализ", "Статус",
+    "Протокол", "Финальный отчёт", "Глубинный анализ"
+]
+COLUMNS = [
+    "user_id", "full_name", "vacancy_title", "resume",
+    "percentage", "analysis", "status",
+    "protocol", "final_report", "deep_analysis"
+]
+
+
+class CandidateStore:
+    """
+    Хранилище кандидатов бота в SQLite с первичным ключом user_id.
+    CSV остаётся производным представлением и выгружается по запросу.
+    """
+
+    def __init__(self, path, legacy_csv=None):
+        self.path = path
+        self._lock = threading.Lock()
+        is_new = not os.path.exists(path)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS candidates (
+                user_id INTEGER PRIMARY KEY,
+                full_name TEXT,
+                vacancy_title TEXT,
+                resume TEXT,
+                percentage INTEGER,
+                analysis TEXT,
+                status TEXT,
+                protocol TEXT DEFAULT '',
+                final_report TEXT DEFAULT '',
+                deep_analysis TEXT DEFAULT ''
+            )
+            """
+        )
+        self._conn.commit()
+
+        if is_new and legacy_csv and os.path.exists(legacy_csv):
+            self.import_csv(legacy_csv)
+
+    def save_candidate(self, user_id, full_name, vacancy_title, resume, percentage, analysis, status=""):
+        """Добавляет кандидата или заменяет его предыдущую заявку"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO candidates
+                    (user_id, full_name, vacancy_title, resume, percentage, analysis, status)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (int(user_id), full_name, vacancy_title, resume, percentage, analysis, status),
+            )
+
+    def update_protocol(self, user_id, protocol, final_report="", deep_analysis=""):
+        """Записывает протокол и отчёты собеседования кандидата"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE candidates SET protocol = ?, final_report = ?, deep_analysis = ? WHERE user_id = ?",
+                (protocol, final_report, deep_analysis, int(user_id)),
+            )
+
+    def get(self, user_id):
+        """Данные кандидата по ID или None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM candidates WHERE user_id = ?", (int(user_id),)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def export_csv(self, csv_path):
+        """Выгружает всех кандидатов в CSV в прежнем формате"""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM candidates ORDER BY rowid"
+            ).fetchall()
+
+        tmp_path = csv_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(CSV_HEADERS)
+            writer.writerows([tuple(row) for row in rows])
+        os.replace(tmp_path, csv_path)
+        return len(rows)
+
+    def import_csv(self, csv_path):
+        """Переносит кандидатов из старого candidates.csv"""
+        count = 0
+        with open(csv_path, "r", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            with self._lock, self._conn:
+                for row in reader:
+                    if not row or not row[0].strip().lstrip("-").isdigit():
+                        continue
+                    row = (row + [""] * len(COLUMNS))[:len(COLUMNS)]
+                    self._conn.execute(
+                        f"INSERT OR REPLACE INTO candidates ({', '.join(COLUMNS)}) "
+                        f"VALUES ({', '.join('?' * len(COLUMNS))})",
+                        [int(row[0])] + row[1:],
+                    )
+                    count += 1
+        logger.info(f"Импортировано кандидатов из {csv_path}: {count}")
+        return count
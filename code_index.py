@@ -0,0 +1,117 @@
+import time
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def column_letter(index):
+    """Номер столбца (с 1) в буквенное обозначение A1-нотации"""
+    letters = ""
+    while index > 0:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(ord('A') + rem) + letters
+    return letters
+
+
+class CandidateIndex:
+    """
+    Индекс кандидатов листа Google Sheets: CODE -> номер строки и данные строки.
+    Весь лист читается одним запросом и обновляется по TTL; если код не найден,
+    дочитываются только строки, добавленные после последнего обновления.
+    Работает с любым объектом, у которого есть get_all_values() и get_values(range).
+    """
+
+    def __init__(self, worksheet, ttl=300, tail_interval=5,
+                 code_column='CODE', vacancy_column='VACATION-TEXT'):
+        self.worksheet = worksheet
+        self.ttl = ttl
+        self.tail_interval = tail_interval
+        self.code_column = code_column
+        self.vacancy_column = vacancy_column
+        self.headers = []
+        self._rows = {}
+        self._by_code = {}
+        self._last_row = 1
+        self._loaded_at = 0
+        self._tail_checked_at = 0
+        self._lock = threading.Lock()
+
+    def find_row(self, code):
+        """Номер строки кандидата по коду или None"""
+        code = str(code).strip()
+        if not code:
+            return None
+
+        with self._lock:
+            if time.time() - self._loaded_at > self.ttl:
+                self._refresh()
+
+            row = self._by_code.get(code)
+            if row is None and time.time() - self._tail_checked_at > self.tail_interval:
+                # Кандидат мог быть добавлен после обновления индекса
+                self._refresh_tail()
+                row = self._by_code.get(code)
+            return row
+
+    def row_values(self, row):
+        """Значения ячеек строки из кеша"""
+        with self._lock:
+            return list(self._rows.get(row, []))
+
+    def candidate_text(self, row):
+        """Данные кандидата одной строкой без текста вакансии"""
+        values = self.row_values(row)
+        vacancy_index = self._column_index(self.vacancy_column)
+        return ' '.join(str(cell) for i, cell in enumerate(values) if i != vacancy_index and cell)
+
+    def vacancy_text(self, row):
+        """Текст вакансии из строки кандидата"""
+        values = self.row_values(row)
+        vacancy_index = self._column_index(self.vacancy_column)
+        if vacancy_index is None or vacancy_index >= len(values):
+            return ""
+        return values[vacancy_index] or ""
+
+    def invalidate(self):
+        """Сбрасывает индекс: следующий поиск перечитает лист"""
+        with self._lock:
+            self._loaded_at = 0
+
+    def _refresh(self):
+        values = self.worksheet.get_all_values()
+        self.headers = values[0] if values else []
+        self._rows = {}
+        self._by_code = {}
+        self._last_row = 1
+        self._add_rows(values[1:], start=2)
+        self._loaded_at = time.time()
+        self._tail_checked_at = self._loaded_at
+        logger.info(f"Индекс кандидатов обновлён: {len(self._by_code)} кодов")
+
+    def _refresh_tail(self):
+        self._tail_checked_at = time.time()
+        if not self.headers:
+            self._refresh()
+            return
+
+        start = self._last_row + 1
+        last_column = column_letter(len(self.headers))
+        values = self.worksheet.get_values(f"A{start}:{last_column}")
+        if values:
+            self._add_rows(values, start=start)
+            logger.info(f"Индекс кандидатов дочитан: {len(values)} новых строк")
+
+    def _add_rows(self, rows, start):
+        code_index = self._column_index(self.code_column)
+        for row_number, values in enumerate(rows, start=start):
+            self._rows[row_number] = values
+            self._last_row = row_number
+            if code_index is not None and code_index < len(values):
+                code = str(values[code_index]).strip()
+                # Как и раньше, при повторе кода выигрывает первая строка
+                if code and code not in self._by_code:
+                    self._by_code[code] = row_number
+
+    def _column_index(self, name):
+        return self.headers.index(name) if name in self.headers else None
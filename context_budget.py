@@ -0,0 +1,173 @@
+import math
+import re
+import logging
+from collections import Counter
+from prefilter import tokenize
+
+logger = logging.getLogger(__name__)
+
+# Бюджет контекста одного запроса к YandexGPT (в токенах) и его распределение
+CONTEXT_TOKEN_BUDGET = 3000
+DIGEST_TOKENS = 1200
+SUMMARY_TOKENS = 600
+# Сколько последних реплик всегда передаётся дословно
+MIN_WINDOW_MESSAGES = 4
+
+# Во сколько раз важнее термин, который встречается и в другом документе:
+# требования вакансии, указанные в резюме, и опыт кандидата, нужный вакансии
+DIGEST_FOCUS_WEIGHT = 3.0
+
+# Ограничения длины реплик в сводке (символов)
+SUMMARY_QUESTION_CHARS = 150
+SUMMARY_ANSWER_CHARS = 250
+# До какой доли бюджета сжимается переполненная сводка, чтобы новые реплики
+# помещались в неё без пересжатия на каждом ходу
+SUMMARY_COMPACT_RATIO = 0.6
+
+
+def estimate_tokens(text):
+    """Грубая оценка числа токенов: для русского текста около 3 символов на токен"""
+    return len(text) // 3 + 1
+
+
+def trim_to_tokens(text, tokens):
+    """Обрезает текст до заданного числа токенов"""
+    max_chars = tokens * 3
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rsplit(' ', 1)[0] + " …"
+
+
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?;])\s+|\s*\n\s*")
+
+
+def summarize_extractive(text, tokens, focus=""):
+    """
+    Извлекающая сводка в пределах tokens: текст целиком, если помещается, иначе
+    самые содержательные предложения в исходном порядке. Вес предложения - сумма
+    весов его терминов на токен длины; термин весит больше, если часто встречается
+    в тексте и если есть в focus (втором документе).
+    """
+    text = text or ""
+    if estimate_tokens(text) <= tokens:
+        return text
+
+    sentences = []
+    for sentence in _SENTENCE_SPLIT_RE.split(text):
+        sentence = sentence.strip()
+        if sentence and sentence not in sentences:
+            sentences.append(sentence)
+    return "\n".join(_select_units(sentences, tokens, focus))
+
+
+def _select_units(units, tokens, focus):
+    """Самые содержательные фрагменты в пределах tokens, в исходном порядке"""
+    terms = [set(tokenize(unit)) for unit in units]
+    frequency = Counter(term for unit_terms in terms for term in unit_terms)
+    focus_terms = set(tokenize(focus))
+
+    def density(i):
+        weight = sum(
+            math.log(1 + frequency[term]) * (DIGEST_FOCUS_WEIGHT if term in focus_terms else 1.0)
+            for term in terms[i]
+        )
+        return weight / estimate_tokens(units[i])
+
+    chosen = set()
+    used = 0
+    for i in sorted((i for i in range(len(units)) if terms[i]), key=density, reverse=True):
+        cost = estimate_tokens(units[i])
+        if used + cost <= tokens:
+            chosen.add(i)
+            used += cost
+    if not chosen:
+        # Ни один фрагмент не помещается целиком: берём начало самого содержательного
+        return [trim_to_tokens(units[max(range(len(units)), key=density)], tokens)] if units else []
+    return [units[i] for i in sorted(chosen)]
+
+
+def build_digest(vacancy_text, candidate_text):
+    """
+    Сжатое описание вакансии и резюме для начала контекста: извлекающие сводки
+    обоих документов, где предпочтение отдаётся их общим терминам.
+    Бюджет, не занятый вакансией, достаётся резюме.
+    """
+    vacancy = summarize_extractive(vacancy_text, DIGEST_TOKENS // 2, focus=candidate_text)
+    candidate = summarize_extractive(candidate_text, DIGEST_TOKENS - estimate_tokens(vacancy), focus=vacancy_text)
+    return (
+        f"Вакансия:\n{vacancy}\n\n"
+        f"Резюме кандидата:\n{candidate}\n\n"
+        "Начни собеседование."
+    )
+
+
+def _summary_line(message, question=""):
+    """Строка сводки для реплики: главное из вопроса или из ответа на него"""
+    if message['role'] == 'assistant':
+        return "Вопрос: " + summarize_extractive(message['text'], SUMMARY_QUESTION_CHARS // 3).replace("\n", " ")
+    answer = summarize_extractive(message['text'], SUMMARY_ANSWER_CHARS // 3, focus=question)
+    return "Ответ: " + answer.replace("\n", " ")
+
+
+def _compact_summary(lines, focus):
+    """
+    Пересжимает переполненную сводку: остаются самые содержательные ходы за всё
+    собеседование, а не только последние. Вопрос и ответ на него остаются вместе.
+    """
+    turns = []
+    for line in lines:
+        if line.startswith("Ответ: ") and turns:
+            turns[-1] += "\n" + line
+        else:
+            turns.append(line)
+    kept = _select_units(turns, int(SUMMARY_TOKENS * SUMMARY_COMPACT_RATIO), focus)
+    return "\n".join(kept).split("\n") if kept else []
+
+
+def build_context(session_data, budget=CONTEXT_TOKEN_BUDGET):
+    """
+    Собирает сообщения для очередного запроса к модели в пределах бюджета:
+    системный промпт, сжатые вакансия и резюме, сводка старых реплик
+    и последние реплики дословно. Состояние сводки хранится в session_data['context']
+    и обновляется инкрементально: каждая реплика, вышедшая из окна, сжимается
+    один раз, а переполненная сводка пересжимается целиком, а не теряет старые ходы.
+    Окно всегда начинается с вопроса, поэтому роли чередуются и ответ не
+    отрывается от вопроса, на который он дан.
+    """
+    messages = session_data['messages']
+    system, dialog = messages[0], messages[2:]
+
+    context = session_data.setdefault('context', {})
+    if 'digest' not in context:
+        context['digest'] = build_digest(session_data.get('vacancy_data'), session_data.get('candidate_data'))
+        context['summary_lines'] = []
+        context['summarized'] = 0
+
+    # Подбираем окно последних реплик, которое помещается в оставшийся бюджет
+    fixed = estimate_tokens(system['text']) + estimate_tokens(context['digest']) + SUMMARY_TOKENS
+    window_start = len(dialog)
+    used = 0
+    while window_start > context['summarized']:
+        cost = estimate_tokens(dialog[window_start - 1]['text'])
+        if len(dialog) - window_start >= MIN_WINDOW_MESSAGES and fixed + used + cost > budget:
+            break
+        used += cost
+        window_start -= 1
+    # Ответ без своего вопроса модель понять не может: окно начинается с вопроса
+    while window_start > context['summarized'] and dialog[window_start]['role'] != 'assistant':
+        window_start -= 1
+
+    # Реплики, вышедшие из окна, добавляем в сводку
+    for i in range(context['summarized'], window_start):
+        question = dialog[i - 1]['text'] if i and dialog[i - 1]['role'] == 'assistant' else ""
+        context['summary_lines'].append(_summary_line(dialog[i], question))
+    context['summarized'] = max(context['summarized'], window_start)
+
+    if estimate_tokens("\n".join(context['summary_lines'])) > SUMMARY_TOKENS:
+        context['summary_lines'] = _compact_summary(context['summary_lines'], context['digest'])
+
+    intro = context['digest']
+    if context['summary_lines']:
+        intro += "\n\nКраткое содержание предыдущей части собеседования:\n" + "\n".join(context['summary_lines'])
+
+    return [system, {"role": "user", "text": intro}] + dialog[context['summarized']:]
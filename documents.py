@@ -0,0 +1,410 @@
+import hashlib
+import importlib.util
+import multiprocessing
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+DOCUMENTS_DB = "documents.sqlite3"
+# PDF разбирается только при установленном pypdf
+SUPPORTED_EXTENSIONS = (".docx", ".rtf", ".txt") + ((".pdf",) if importlib.util.find_spec("pypdf") else ())
+# Процессов разбора при обработке папки
+PARSE_WORKERS = os.cpu_count() or 1
+
+# ---------- Извлечение текста ----------
+# Группы RTF, которые не содержат текста документа
+_RTF_SKIP_GROUPS = {
+    "fonttbl", "colortbl", "stylesheet", "info", "pict", "header", "footer", "headerl", "headerr",
+    "footerl", "footerr", "object", "themedata", "colorschememapping", "datastore", "latentstyles",
+    "listtable", "listoverridetable", "rsidtbl", "generator", "xmlnstbl", "mmathPr", "fldinst",
+}
+_RTF_SPECIAL = {"par": "\n", "line": "\n", "row": "\n", "sect": "\n\n", "page": "\n\n", "tab": "\t", "cell": "\t",
+                "emdash": "\u2014", "endash": "\u2013", "bullet": "\u2022", "lquote": "\u2018", "rquote": "\u2019",
+                "ldblquote": "\u201c", "rdblquote": "\u201d", "emspace": " ", "enspace": " "}
+_RTF_TOKEN_RE = re.compile(
+    r"\\([a-zA-Z]+)(-?\d+)? ?|\\'([0-9a-fA-F]{2})|\\([^a-zA-Z])|([{}])|[\r\n]+|([^\\{}\r\n]+)"
+)
+
+
+def rtf_to_text(data):
+    """Текст RTF-документа: служебные группы пропускаются, \\'hh и \\uN декодируются"""
+    raw = data.decode("latin-1")
+    match = re.search(r"\\ansicpg(\d+)", raw)
+    codepage = f"cp{match.group(1)}" if match else "cp1251"
+
+    stack = []
+    skip = False
+    uc = 1
+    pending_skip = 0
+    out = []
+    hex_bytes = bytearray()
+
+    def flush_hex():
+        if hex_bytes:
+            out.append(hex_bytes.decode(codepage, errors="replace"))
+            hex_bytes.clear()
+
+    for word, arg, hex_code, symbol, brace, text in (m.groups() for m in _RTF_TOKEN_RE.finditer(raw)):
+        if hex_code:
+            if pending_skip:
+                pending_skip -= 1
+            elif not skip:
+                hex_bytes.append(int(hex_code, 16))
+            continue
+        flush_hex()
+        if brace == "{":
+            stack.append((skip, uc))
+        elif brace == "}":
+            skip, uc = stack.pop() if stack else (False, 1)
+            pending_skip = 0
+        elif symbol:
+            pending_skip = 0
+            if symbol == "*":
+                skip = True
+            elif not skip and symbol in "\\{}":
+                out.append(symbol)
+            elif not skip and symbol == "~":
+                out.append("\u00a0")
+            elif not skip and symbol in "-_":
+                out.append("-" if symbol == "_" else "")
+        elif word:
+            pending_skip = 0
+            if word in _RTF_SKIP_GROUPS:
+                skip = True
+            elif word == "uc":
+                uc = int(arg or 1)
+            elif word == "u":
+                if not skip:
+                    code = int(arg)
+                    out.append(chr(code + 65536 if code < 0 else code))
+                pending_skip = uc
+            elif not skip and word in _RTF_SPECIAL:
+                out.append(_RTF_SPECIAL[word])
+        elif text and not skip:
+            if pending_skip:
+                text = text[pending_skip:]
+                pending_skip = 0
+            out.append(text)
+    flush_hex()
+
+    text = "".join(out).replace("\u00a0", " ")
+    return re.sub(r"\n{3,}", "\n\n", re.sub(r"[ \t]+\n", "\n", text)).strip()
+
+
+def docx_to_text(path):
+    import docx2txt
+    return docx2txt.process(path)
+
+
+def pdf_to_text(path):
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise ValueError("Для PDF нужен пакет pypdf")
+    return "\n".join(page.extract_text() or "" for page in PdfReader(path).pages)
+
+
+def txt_to_text(data):
+    for encoding in ("utf-8-sig", "cp1251"):
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return data.decode("utf-8", errors="replace")
+
+
+def extract_text(path):
+    """Текст документа по расширению файла; ValueError для неподдерживаемых форматов"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".docx":
+        return docx_to_text(path)
+    if extension == ".pdf":
+        return pdf_to_text(path)
+    with open(path, "rb") as f:
+        data = f.read()
+    if extension == ".rtf":
+        return rtf_to_text(data)
+    if extension == ".txt":
+        return txt_to_text(data)
+    raise ValueError(f"Формат {extension or 'без расширения'} не поддерживается")
+
+
+def parse_document(path):
+    """Текст документа и время разбора; вызывается в процессе пула"""
+    started = time.perf_counter()
+    text = extract_text(path)
+    return text, time.perf_counter() - started
+
+
+def _parse_to_pipe(path, conn):
+    try:
+        conn.send((parse_document(path), None))
+    except Exception as e:
+        conn.send((None, str(e)))
+    finally:
+        conn.close()
+
+
+def parse_with_timeout(path, timeout):
+    """
+    Разбирает документ в отдельном процессе и возвращает (текст, время разбора).
+    Если разбор не уложился в timeout, процесс завершается - зависший или
+    вредоносный файл не занимает процесс после таймаута.
+    """
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=_parse_to_pipe, args=(path, sender), daemon=True)
+    process.start()
+    sender.close()
+    try:
+        if not receiver.poll(timeout):
+            raise TimeoutError(f"разбор не уложился в {timeout} с")
+        try:
+            result, error = receiver.recv()
+        except EOFError:
+            raise RuntimeError(f"процесс разбора завершился с кодом {process.exitcode}")
+    finally:
+        if process.is_alive():
+            process.terminate()
+        process.join()
+        receiver.close()
+    if error is not None:
+        raise ValueError(error)
+    return result
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# ---------- Кеш разобранных документов ----------
+class DocumentStore:
+    """
+    Кеш извлечённого текста документов в SQLite (текст сжат zlib).
+    Неизменённый файл (тот же путь, размер и mtime) берётся из кеша по одному
+    stat(); изменённый по времени, но с тем же содержимым - по хешу файла.
+    Разбираются только новые документы, при обработке папки - в пуле процессов.
+    Файл, которого нет в кеше, сначала хешируется, затем разбирается. Ошибка
+    разбора тоже запоминается по пути, размеру и mtime: после первой неудачи
+    неизменённый файл больше не хешируется и не разбирается.
+    """
+
+    def __init__(self, path=DOCUMENTS_DB):
+        self.path = path
+        self.stat_hits = 0
+        self.hash_hits = 0
+        self.parsed = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS documents (
+                path TEXT PRIMARY KEY,
+                size INTEGER,
+                mtime_ns INTEGER,
+                sha256 TEXT,
+                text BLOB,
+                parse_seconds REAL,
+                parsed_at REAL,
+                error TEXT
+            )
+            """
+        )
+        # Кеш, созданный до появления столбца error
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(documents)")}
+        if "error" not in columns:
+            self._conn.execute("ALTER TABLE documents ADD COLUMN error TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS documents_sha256 ON documents (sha256)")
+        self._conn.commit()
+
+    def extract(self, path):
+        """Текст документа или None, если файл не удалось прочитать"""
+        return self.extract_many([path], workers=0)[path]
+
+    def extract_many(self, paths, workers=PARSE_WORKERS):
+        """
+        Словарь путь -> текст (None при ошибке). Документы, которых нет в кеше,
+        разбираются в пуле из workers процессов; workers=0 - в текущем процессе.
+        """
+        results = {}
+        to_parse = {}
+        for path in paths:
+            if not path.lower().endswith(SUPPORTED_EXTENSIONS):
+                logger.error(f"Неподдерживаемый формат документа: {path}")
+                results[path] = None
+                continue
+            try:
+                info = os.stat(path)
+                cached = self._lookup(path, info)
+                if cached is None:
+                    sha256 = file_hash(path)
+                    cached = self._lookup_hash(path, info, sha256)
+                    if cached is None:
+                        to_parse[path] = (info, sha256)
+                        continue
+            except Exception as e:
+                logger.error(f"Ошибка при чтении файла {path}: {e}")
+                results[path] = None
+                continue
+            text, error = cached
+            if error is not None:
+                logger.warning(f"Файл {path} не разбирается повторно, прошлая ошибка: {error}")
+            results[path] = text
+
+        if not to_parse:
+            return results
+
+        if workers and len(to_parse) > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(to_parse))) as pool:
+                parsed = zip(to_parse, pool.map(_safe_parse, to_parse))
+                for path, (text, seconds, error) in parsed:
+                    results[path] = self._store_parsed(path, *to_parse[path], text, seconds, error)
+        else:
+            for path in to_parse:
+                results[path] = self._store_parsed(path, *to_parse[path], *_safe_parse(path))
+        return results
+
+    def extract_dir(self, directory, workers=PARSE_WORKERS):
+        """Текст всех поддерживаемых документов папки (рекурсивно)"""
+        paths = []
+        for root, _, names in os.walk(directory):
+            paths.extend(
+                os.path.join(root, name) for name in sorted(names)
+                if name.lower().endswith(SUPPORTED_EXTENSIONS) and not name.startswith("~$")
+            )
+        return self.extract_many(paths, workers)
+
+    def stats(self):
+        with self._lock:
+            count, size, failed = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(text)), 0), COUNT(error) FROM documents"
+            ).fetchone()
+        return {
+            "documents": count,
+            "failed": failed,
+            "stored_bytes": size,
+            "stat_hits": self.stat_hits,
+            "hash_hits": self.hash_hits,
+            "parsed": self.parsed,
+        }
+
+    def close(self):
+        self._conn.close()
+
+    def _lookup(self, path, info):
+        """(текст, ошибка) неизменённого файла или None, если его нет в кеше"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text, error FROM documents WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (os.path.abspath(path), info.st_size, info.st_mtime_ns),
+            ).fetchone()
+            if row is None:
+                return None
+            self.stat_hits += 1
+        if row[1] is not None:
+            return None, row[1]
+        return zlib.decompress(row[0]).decode("utf-8"), None
+
+    def _lookup_hash(self, path, info, sha256):
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT text, parse_seconds FROM documents WHERE sha256 = ? AND error IS NULL LIMIT 1", (sha256,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._save(path, info, sha256, row[0], row[1])
+            self.hash_hits += 1
+        return zlib.decompress(row[0]).decode("utf-8"), None
+
+    def _store_parsed(self, path, info, sha256, text, seconds, error):
+        if error is not None:
+            logger.error(f"Ошибка при чтении файла {path}: {error}")
+            with self._lock, self._conn:
+                self._save(path, info, sha256, None, seconds, error)
+            return None
+        logger.info(f"Документ {os.path.basename(path)} разобран за {seconds * 1000:.0f} мс")
+        with self._lock, self._conn:
+            self._save(path, info, sha256, zlib.compress(text.encode("utf-8")), seconds)
+            self.parsed += 1
+        return text
+
+    def _save(self, path, info, sha256, packed, seconds, error=None):
+        self._conn.execute(
+            """
+            INSERT OR REPLACE INTO documents (path, size, mtime_ns, sha256, text, parse_seconds, parsed_at, error)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (os.path.abspath(path), info.st_size, info.st_mtime_ns, sha256, packed, seconds, time.time(), error),
+        )
+
+
+def _safe_parse(path):
+    # Ошибка одного файла не должна прерывать разбор папки
+    try:
+        text, seconds = parse_document(path)
+        return text or "", seconds, None
+    except Exception as e:
+        return None, 0.0, str(e)
+
+
+def _benchmark(directory, copies=20):
+    """Первый разбор папки и повторный запуск по неизменённым файлам"""
+    import shutil
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Копии с разным содержимым, чтобы кеш по хешу не срабатывал
+        corpus = os.path.join(tmp, "corpus")
+        os.makedirs(corpus)
+        sources = DocumentStore(os.path.join(tmp, "sources.sqlite3")).extract_dir(directory, workers=0)
+        for i in range(copies):
+            for path, text in sources.items():
+                if text is None:
+                    continue
+                name, extension = os.path.splitext(os.path.basename(path))
+                target = os.path.join(corpus, f"{name} {i}{extension}")
+                if extension.lower() == ".txt":
+                    with open(target, "w", encoding="utf-8") as f:
+                        f.write(f"{text}\n{i}")
+                else:
+                    shutil.copy(path, target)
+                    with open(target, "ab") as f:
+                        f.write(b" " * (i + 1))
+
+        for workers in (0, PARSE_WORKERS):
+            store = DocumentStore(os.path.join(tmp, f"documents{workers}.sqlite3"))
+            started = time.perf_counter()
+            texts = store.extract_dir(corpus, workers=workers)
+            cold = time.perf_counter() - started
+            mode = f"пул из {workers} процессов" if workers else "в текущем процессе"
+            print(f"Первый разбор {len(texts)} документов, {mode}: {cold:.2f} с")
+
+        started = time.perf_counter()
+        store.extract_dir(corpus)
+        warm = time.perf_counter() - started
+        print(f"Повторный запуск: {warm * 1000:.0f} мс, {store.stats()}")
+
+        # Файлы скопированы заново: время изменения другое, содержимое то же
+        for name in os.listdir(corpus):
+            os.utime(os.path.join(corpus, name))
+        started = time.perf_counter()
+        store.extract_dir(corpus)
+        print(f"После изменения mtime: {(time.perf_counter() - started) * 1000:.0f} мс, {store.stats()}")
+
+
+if __name__ == "__main__":
+    import sys
+
+    logging.basicConfig(level=logging.WARNING)
+    _benchmark(sys.argv[1] if len(sys.argv) > 1 else "AI HR")
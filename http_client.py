@@ -0,0 +1,176 @@
+import asyncio
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+# Таймауты (подключение, чтение) в секундах для каждого типа запроса
+TIMEOUTS = {
+    "gpt": (5, 30),
+    "tts": (5, 30),
+    "report": (5, 60),
+    "score": (5, 60),
+}
+DEFAULT_TIMEOUT = (5, 30)
+
+# Размер пула keep-alive соединений на один хост
+POOL_MAXSIZE = 32
+
+# Максимум одновременных запросов из асинхронного кода к каждому типу API
+CONCURRENCY_LIMITS = {
+    "gpt": 8,
+    "tts": 8,
+    "report": 4,
+    "score": 4,
+}
+DEFAULT_CONCURRENCY = 4
+
+_session = None
+_session_lock = threading.Lock()
+_semaphores = {}
+# Отдельный пул потоков, чтобы лимиты выше не упирались в размер пула asyncio по умолчанию
+_executor = ThreadPoolExecutor(
+    max_workers=sum(CONCURRENCY_LIMITS.values()),
+    thread_name_prefix="http_client",
+)
+
+
+def create_session():
+    """Создаёт сессию requests с пулом соединений и повторными попытками"""
+    session = requests.Session()
+    # POST к LLM не идемпотентен: после таймаута чтения или 5xx запрос мог быть
+    # выполнен и оплачен, поэтому повторяем только ошибки соединения и 429,
+    # когда сервер запрос точно не обработал
+    retry_strategy = Retry(
+        total=3,
+        connect=3,
+        read=0,
+        other=0,
+        status=3,
+        backoff_factor=0.5,
+        status_forcelist=[429],
+        allowed_methods=frozenset(["GET", "POST"]),
+    )
+    adapter = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=POOL_MAXSIZE,
+        max_retries=retry_strategy,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session():
+    """Общая для процесса сессия: соединения с API переиспользуются между вызовами"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session()
+    return _session
+
+
+def post(endpoint, url, **kwargs):
+    """POST через общий пул с таймаутом, заданным для типа запроса"""
+    kwargs.setdefault("timeout", TIMEOUTS.get(endpoint, DEFAULT_TIMEOUT))
+    return get_session().post(url, **kwargs)
+
+
+async def apost(endpoint, url, **kwargs):
+    """
+    POST для асинхронных обработчиков: запрос выполняется в пуле потоков
+    и не блокирует цикл событий, число одновременных запросов ограничено.
+    """
+    semaphore = _semaphores.get(endpoint)
+    if semaphore is None:
+        semaphore = _semaphores[endpoint] = asyncio.Semaphore(
+            CONCURRENCY_LIMITS.get(endpoint, DEFAULT_CONCURRENCY)
+        )
+    async with semaphore:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_executor, partial(post, endpoint, url, **kwargs))
+
+
+def _start_stub_server(delay=0.0, answer="ok"):
+    """Локальная заглушка API, отвечающая с заданной задержкой"""
+    import json
+    import time
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if delay:
+                time.sleep(delay)
+            body = json.dumps({"result": {"alternatives": [{"message": {"text": answer}}]}}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/completion"
+
+
+def _benchmark(requests_count=200):
+    """Сравнение новой сессии на каждый вызов и общего пула на локальной заглушке"""
+    import time
+
+    server, url = _start_stub_server()
+
+    started = time.perf_counter()
+    for _ in range(requests_count):
+        with create_session() as session:
+            session.post(url, json={"messages": []}, timeout=DEFAULT_TIMEOUT)
+    fresh = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for _ in range(requests_count):
+        post("gpt", url, json={"messages": []})
+    pooled = time.perf_counter() - started
+
+    server.shutdown()
+    print(f"Новая сессия на запрос: {fresh / requests_count * 1000:.2f} мс/запрос")
+    print(f"Общий пул соединений:   {pooled / requests_count * 1000:.2f} мс/запрос")
+
+
+def _load_test(users=(1, 4, 8), turns=5, delay=0.2):
+    """Нагрузочный тест apost: N пользователей против заглушки LLM с задержкой"""
+    import time
+
+    server, url = _start_stub_server(delay)
+
+    async def user():
+        for _ in range(turns):
+            await apost("gpt", url, json={"messages": []})
+
+    async def run(n):
+        started = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(n)))
+        return time.perf_counter() - started
+
+    for n in users:
+        _semaphores.clear()
+        elapsed = asyncio.run(run(n))
+        print(f"{n} польз.: {n * turns / elapsed:.1f} запросов/с за {elapsed:.2f} с")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    _benchmark()
+    _load_test()
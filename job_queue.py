@@ -0,0 +1,171 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Статусы задания
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobQueue:
+    """
+    Очередь фоновых заданий, сохраняемая в SQLite, чтобы переживать перезапуск.
+    Задание - тип и JSON-данные; обработчик типа выполняется в фоновом потоке.
+    При ошибке задание повторяется с экспоненциальной паузой, а изменения,
+    внесённые обработчиком в данные, сохраняются: повтор продолжает с места сбоя.
+    """
+
+    def __init__(self, path, workers=1, max_attempts=5, backoff=30.0, poll_interval=5.0, lease_timeout=600.0):
+        self.path = path
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.poll_interval = poll_interval
+        self.lease_timeout = lease_timeout
+        self._handlers = {}
+        self._threads = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT,
+                payload TEXT,
+                status TEXT,
+                attempts INTEGER DEFAULT 0,
+                run_at REAL,
+                error TEXT DEFAULT '',
+                created_at REAL,
+                updated_at REAL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def register(self, kind, handler):
+        """Задаёт обработчик для типа заданий"""
+        self._handlers[kind] = handler
+
+    def enqueue(self, kind, payload):
+        """Ставит задание в очередь и возвращает его id"""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO jobs (id, kind, payload, status, run_at, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (job_id, kind, json.dumps(payload, ensure_ascii=False), QUEUED, now, now, now),
+            )
+        self._wakeup.set()
+        return job_id
+
+    def start(self):
+        """Запускает фоновые потоки обработки"""
+        if self._threads:
+            return
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job_queue-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        self._stopped.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def stats(self):
+        """Число заданий по статусам"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) AS count FROM jobs GROUP BY status"
+            ).fetchall()
+        return {row["status"]: row["count"] for row in rows}
+
+    def run_pending(self):
+        """Выполняет все готовые задания в текущем потоке; возвращает их число"""
+        count = 0
+        while True:
+            job = self._claim()
+            if job is None:
+                return count
+            self._run(job)
+            count += 1
+
+    def _work(self):
+        while not self._stopped.is_set():
+            if self.run_pending() == 0:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+    def _claim(self):
+        # Задание забирает только один поток, даже если очередь открыта в нескольких процессах.
+        # Задания, которые слишком долго числятся выполняемыми, прервал перезапуск - берём их заново
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                """
+                SELECT * FROM jobs
+                WHERE (status = ? AND run_at <= ?) OR (status = ? AND updated_at < ?)
+                ORDER BY run_at LIMIT 1
+                """,
+                (QUEUED, now, RUNNING, now - self.lease_timeout),
+            ).fetchone()
+            if row is None:
+                return None
+            cur = self._conn.execute(
+                """
+                UPDATE jobs SET status = ?, attempts = attempts + 1, updated_at = ?
+                WHERE id = ? AND status = ? AND updated_at = ?
+                """,
+                (RUNNING, now, row["id"], row["status"], row["updated_at"]),
+            )
+            if cur.rowcount == 0:
+                return None
+        job = dict(row)
+        job["attempts"] += 1
+        job["payload"] = json.loads(job["payload"])
+        return job
+
+    def _run(self, job):
+        handler = self._handlers.get(job["kind"])
+        started = time.perf_counter()
+        try:
+            if handler is None:
+                raise RuntimeError(f"Нет обработчика для заданий {job['kind']}")
+            handler(job["payload"])
+        except Exception as e:
+            if job["attempts"] >= self.max_attempts:
+                status, run_at = FAILED, time.time()
+                logger.error(f"Задание {job['kind']} {job['id']} не выполнено после {job['attempts']} попыток: {e}")
+            else:
+                status = QUEUED
+                run_at = time.time() + self.backoff * (2 ** (job["attempts"] - 1))
+                logger.warning(f"Ошибка задания {job['kind']} {job['id']} (попытка {job['attempts']}): {e}")
+            self._finish(job, status, run_at, str(e))
+            return
+
+        self._finish(job, DONE, time.time(), "")
+        logger.info(f"Задание {job['kind']} {job['id']} выполнено за {time.perf_counter() - started:.1f} с")
+
+    def _finish(self, job, status, run_at, error):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, payload = ?, run_at = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, json.dumps(job["payload"], ensure_ascii=False), run_at, error, time.time(), job["id"]),
+            )
@@ -2,15 +2,25 @@ from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from webdriver_manager.chrome import ChromeDriverManager
 from google.oauth2.service_account import Credentials
 import gspread
 import time
-import requests
-import json
-import docx2txt
+import queue
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from sheets_batch import BufferedSheetWriter
+from scoring import BatchScorer
+from prefilter import IncrementalPrefilter, PREFILTER_TOP_K
+from documents import DocumentStore
+import os
+import sys
+from html.parser import HTMLParser
 
 # Global constants
 TARGET_DATA_QA = [
@@ -41,68 +51,50 @@ GOOGLE_SHEET_NAME = 'hr-base'
 GOOGLE_WORKSHEET_ALL = 'All'
 GOOGLE_WORKSHEET_TEST = 'Test_Vacation'
 
+# Scraping pool settings
+SCRAPE_WORKERS = 3
+SCORE_WORKERS = 4
+PAGE_LOADS_PER_SECOND = 0.5
+SCORE_THRESHOLD = 0.7
+# Scores are cached on disk by resume/vacancy content, so re-runs skip the LLM
+SCORE_CACHE_DIR = 'score_cache'
+# Resumes ranked by the pre-filter at once: one search results page (items_on_page=50)
+PREFILTER_BATCH = 50
+# Fields compared with the vacancy by the local BM25 pre-filter before LLM scoring
+PREFILTER_DATA_QA = [
+    "resume-specializations",
+    "resume-experience-block",
+    "skills-table",
+    "resume-languages-block",
+    "resume-about-block",
+    "resume-education-block",
+    "resume-education-courses-block",
+    "resume-block-certificate",
+    "resume-additional-info-block"
+]
 
-def extract_docx(file_path):
-    """
-    Извлекает текст из .docx файла с помощью docx2txt
-    """
-    try:
-        text = docx2txt.process(file_path)
-        return text
-    except Exception as e:
-        print(f"Ошибка при чтении файла: {e}")
-        return None
+# Page readiness settings
+POLL_FREQUENCY = 0.1
+NETWORK_IDLE_TIME = 0.5
+# CSS selector matching any of the resume fields we extract
+RESUME_FIELDS_SELECTOR = ", ".join(f"[data-qa='{data_qa}']" for data_qa in TARGET_DATA_QA)
+
+# Reads the text of every requested data-qa field in one WebDriver round-trip
+EXTRACT_FIELDS_JS = """
+const result = {};
+for (const dataQa of arguments[0]) {
+    result[dataQa] = Array.from(document.querySelectorAll(`[data-qa='${dataQa}']`))
+        .map(element => (element.innerText || '').trim())
+        .filter(text => text)
+        .join('\\n');
+}
+return result;
+"""
+
+# Wait durations per page step, in seconds
+STEP_TIMINGS = defaultdict(list)
+_timings_lock = threading.Lock()
 
-# Конфиг (замени своими значениями)
-YC_GPT_URL = "https://llm.api.cloud.yandex.net/foundationModels/v1/completion"
-YC_FOLDER_ID = "b1gvjms07lsr4hfhq8v3"
-YC_API_KEY = "AQVNzGQyyfsE_0ScOUIqgCbaDjPBQjYEBL7-h_i3"
-
-def determine_score(resume_text: str, vacancy_text: str) -> int:
-    """
-    Анализ резюме против вакансии через YandexGPT.
-    Возвращает процент соответствия.
-    """
-    headers = {
-        "Authorization": f"Api-Key {YC_API_KEY}",
-        "Content-Type": "application/json",
-    }
-    data = {
-        "modelUri": f"gpt://{YC_FOLDER_ID}/yandexgpt/latest",
-        "completionOptions": {
-            "stream": False,
-            "temperature": 0.2,
-            "maxTokens": 1000
-        },
-        "messages": [
-            {
-                "role": "system",
-                "text": (
-                    "Ты HR-специалист. Сравни резюме и вакансию и оцени, "
-                    "насколько кандидат подходит. Верни только число процентов (0–100)."
-                )
-            },
-            {
-                "role": "user",
-                "text": f"Вакансия:\n{vacancy_text}\n\nРезюме:\n{resume_text}"
-            }
-        ]
-    }
-
-    resp = requests.post(YC_GPT_URL, headers=headers, data=json.dumps(data))
-    resp.raise_for_status()
-    result = resp.json()
-
-    # Достаём текст ответа
-    answer = result["result"]["alternatives"][0]["message"]["text"]
-
-    # Пробуем выделить число
-    try:
-        percent = int("".join(ch for ch in answer if ch.isdigit()))
-        # Преобразуем проценты в дробное число от 0.0 до 1.0
-        return max(0.0, min(1.0, percent / 100.0))
-    except ValueError:
-        return 0.0
 
 def init_google_sheets(sheet_name):
     # Initialize Google Sheets for specific worksheet
@@ -126,6 +118,47 @@ def init_google_sheets(sheet_name):
         print(f"Google Sheets error ({sheet_name}): {e}")
         return None
 
+def wait_for(driver, condition, step, timeout=20):
+    # Wait until the condition holds, polling often, and record how long the step took
+    started = time.perf_counter()
+    try:
+        return WebDriverWait(driver, timeout, poll_frequency=POLL_FREQUENCY).until(condition)
+    finally:
+        with _timings_lock:
+            STEP_TIMINGS[step].append(time.perf_counter() - started)
+
+def network_idle(idle_time=NETWORK_IDLE_TIME):
+    # Condition: document has loaded and no new resources were requested for idle_time seconds
+    last = {"count": -1, "since": time.monotonic()}
+
+    def condition(driver):
+        ready_state, resource_count = driver.execute_script(
+            "return [document.readyState, performance.getEntriesByType('resource').length];"
+        )
+        now = time.monotonic()
+        if ready_state != "complete" or resource_count != last["count"]:
+            last["count"] = resource_count
+            last["since"] = now
+            return False
+        return now - last["since"] >= idle_time
+
+    return condition
+
+def wait_for_network_idle(driver, step, timeout=10):
+    # Best-effort idle wait: a page that never goes quiet should not fail the flow
+    try:
+        wait_for(driver, network_idle(), step, timeout)
+        return True
+    except TimeoutException:
+        print(f"Network did not settle during '{step}', continuing")
+        return False
+
+def print_step_timings():
+    # Print average and maximum wait per page step
+    with _timings_lock:
+        for step, durations in sorted(STEP_TIMINGS.items()):
+            print(f"{step}: {len(durations)} waits, avg {sum(durations) / len(durations):.2f}s, max {max(durations):.2f}s")
+
 def setup_driver():
     # Initialize and configure Chrome driver
     options = Options()
@@ -136,23 +169,30 @@ def setup_driver():
     driver.maximize_window()
     return driver
 
+def create_worker_driver():
+    # Start a browser session and log in; returns None if login failed
+    driver = setup_driver()
+    if login_to_site(driver) and enter_credentials(driver):
+        return driver
+    driver.quit()
+    return None
+
 def login_to_site(driver):
     # Navigate to login page and expand password login
     try:
         driver.get("https://hh.ru/account/login?role=employer")
-        WebDriverWait(driver, 20).until(
-            EC.presence_of_element_located((By.TAG_NAME, "body"))
-        )
+        wait_for(driver, EC.presence_of_element_located((By.TAG_NAME, "body")), "login page")
         print('Page loaded successfully')
         
-        login_button = WebDriverWait(driver, 20).until(
-            EC.element_to_be_clickable((By.CSS_SELECTOR, "button[data-qa='expand-login-by_password']"))
+        login_button = wait_for(
+            driver,
+            EC.element_to_be_clickable((By.CSS_SELECTOR, "button[data-qa='expand-login-by_password']")),
+            "password login button"
         )
         print('Button found')
         
         driver.execute_script("arguments[0].click();", login_button)
         print("Click via JavaScript executed")
-        time.sleep(3)
         return True
     except Exception as e:
         print(f"Error occurred: {e}")
@@ -161,29 +201,40 @@ def login_to_site(driver):
 def enter_credentials(driver):
     # Enter email and password credentials
     try:
-        email_field = WebDriverWait(driver, 10).until(
-            EC.element_to_be_clickable((By.CSS_SELECTOR, "input[data-qa='login-input-username']"))
+        email_field = wait_for(
+            driver,
+            EC.element_to_be_clickable((By.CSS_SELECTOR, "input[data-qa='login-input-username']")),
+            "username field",
+            timeout=10
         )
         email_field.clear()
         email_field.send_keys("")
         print("Login entered successfully")
-        time.sleep(3)
         
-        password_field = WebDriverWait(driver, 10).until(
-            EC.element_to_be_clickable((By.CSS_SELECTOR, "input[data-qa='login-input-password']"))
+        password_field = wait_for(
+            driver,
+            EC.element_to_be_clickable((By.CSS_SELECTOR, "input[data-qa='login-input-password']")),
+            "password field",
+            timeout=10
         )
         password_field.clear()
         password_field.send_keys("")
         print("Password entered successfully")
         
-        login_button = WebDriverWait(driver, 20).until(
-            EC.element_to_be_clickable((By.CSS_SELECTOR, "button[data-qa='account-login-submit']"))
+        login_button = wait_for(
+            driver,
+            EC.element_to_be_clickable((By.CSS_SELECTOR, "button[data-qa='account-login-submit']")),
+            "login submit button"
         )
         print('Login button found')
 
+        login_url = driver.current_url
         driver.execute_script("arguments[0].click();", login_button)
         print("Login click via JavaScript executed")
-        time.sleep(5)
+        
+        # Logged in once we leave the login page and it stops loading
+        wait_for(driver, EC.url_changes(login_url), "login redirect")
+        wait_for_network_idle(driver, "after login")
         return True
     except Exception as e:
         print(f"Error occurred: {e}")
@@ -194,11 +245,12 @@ def get_all_resume_links(driver):
     try:
         print("Redirecting to vacancies page...")
         driver.get("https://hh.ru/search/resume?text=&professional_role=156&professional_role=160&professional_role=10&professional_role=150&professional_role=165&professional_role=36&professional_role=96&professional_role=164&professional_role=104&professional_role=157&professional_role=112&professional_role=113&professional_role=148&professional_role=114&professional_role=116&professional_role=124&professional_role=125&professional_role=126&ored_clusters=true&order_by=relevance&items_on_page=50&search_period=0&job_search_status=unknown&job_search_status=active_search&job_search_status=looking_for_offers&logic=normal&pos=full_text&exp_period=all_time&filter_exp_period=last_three_years&exp_company_size=any&filter_exp_industry=7&label=exclude_viewed_by_user_id&experience=between1And3&experience=between3And6&experience=moreThan6&hhtmFrom=resume_search_result&hhtmFromLabel=resume_search_line")
-        time.sleep(5)
         
-        # Wait for page to fully load
-        WebDriverWait(driver, 20).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, "[data-qa='serp-item__title']"))
+        # Wait until search results are rendered
+        wait_for(
+            driver,
+            EC.presence_of_element_located((By.CSS_SELECTOR, "[data-qa='serp-item__title']")),
+            "search results"
         )
         
         # Find all resume links
@@ -219,35 +271,107 @@ def get_all_resume_links(driver):
         print(f"Error getting resume links: {e}")
         return []
 
+def extract_fields(driver):
+    # Get text of all TARGET_DATA_QA fields in a single execute_script call
+    try:
+        fields = driver.execute_script(EXTRACT_FIELDS_JS, TARGET_DATA_QA)
+        return {data_qa: fields.get(data_qa, "") for data_qa in TARGET_DATA_QA}
+    except Exception as e:
+        print(f"Bulk extraction failed, falling back to per-element reads: {e}")
+        return extract_fields_per_element(driver)
+
+def extract_fields_per_element(driver):
+    # One find_elements call per field plus one .text call per element
+    fields = {}
+    for data_qa in TARGET_DATA_QA:
+        try:
+            elements = driver.find_elements(By.CSS_SELECTOR, f"[data-qa='{data_qa}']")
+            all_text = []
+            for element in elements:
+                element_text = element.text.strip()
+                if element_text:
+                    all_text.append(element_text)
+            fields[data_qa] = "\n".join(all_text)
+        except Exception as e:
+            print(f"Error extracting {data_qa}: {e}")
+            fields[data_qa] = ""
+    return fields
+
+class ResumeFieldsParser(HTMLParser):
+    # Collects text of TARGET_DATA_QA elements from a saved page_source snapshot
+    VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input",
+                 "link", "meta", "source", "track", "wbr"}
+    SKIP_TAGS = {"script", "style", "template"}
+    BLOCK_TAGS = {"div", "p", "li", "ul", "ol", "table", "tr", "td", "th", "section",
+                  "h1", "h2", "h3", "h4", "h5", "h6"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.targets = set(TARGET_DATA_QA)
+        self.fields = {data_qa: [] for data_qa in TARGET_DATA_QA}
+        # Stack of (tag, field opened by this tag or None, text chunks)
+        self.stack = []
+        self.skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.VOID_TAGS:
+            if tag == "br":
+                self.handle_data("\n")
+            return
+        if tag in self.SKIP_TAGS:
+            self.skip_depth += 1
+        if tag in self.BLOCK_TAGS:
+            self.handle_data(" ")
+        data_qa = dict(attrs).get("data-qa")
+        self.stack.append((tag, data_qa if data_qa in self.targets else None, []))
+
+    def handle_endtag(self, tag):
+        if tag in self.VOID_TAGS:
+            return
+        if tag in self.BLOCK_TAGS:
+            self.handle_data(" ")
+        # Close unclosed children up to the matching tag
+        while self.stack:
+            open_tag, data_qa, chunks = self.stack.pop()
+            if open_tag in self.SKIP_TAGS:
+                self.skip_depth -= 1
+            if data_qa:
+                text = " ".join("".join(chunks).split())
+                if text:
+                    self.fields[data_qa].append(text)
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        if self.skip_depth:
+            return
+        for _, data_qa, chunks in self.stack:
+            if data_qa:
+                chunks.append(data)
+
+def parse_resume_html(html):
+    # Offline extraction of TARGET_DATA_QA fields from page HTML
+    parser = ResumeFieldsParser()
+    parser.feed(html)
+    parser.close()
+    return {data_qa: "\n".join(texts) for data_qa, texts in parser.fields.items()}
+
 def extract_resume_data(driver, url):
     # Extract data from a single resume
     try:
         print(f"Processing resume: {url}")
         driver.get(url)
-        time.sleep(3)
         
-        # Wait for resume page to load completely
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, "[data-qa]"))
+        # Wait until resume fields are rendered
+        wait_for(
+            driver,
+            EC.presence_of_element_located((By.CSS_SELECTOR, RESUME_FIELDS_SELECTOR)),
+            "resume fields",
+            timeout=10
         )
         
         resume_data = {"link": url}  # Add link to data
-        
-        for data_qa in TARGET_DATA_QA:
-            try:
-                elements = driver.find_elements(By.CSS_SELECTOR, f"[data-qa='{data_qa}']")
-                if elements:
-                    all_text = []
-                    for element in elements:
-                        element_text = element.text.strip()
-                        if element_text:
-                            all_text.append(element_text)
-                    resume_data[data_qa] = "\n".join(all_text)
-                else:
-                    resume_data[data_qa] = ""
-            except Exception as e:
-                print(f"Error extracting {data_qa}: {e}")
-                resume_data[data_qa] = ""
+        resume_data.update(extract_fields(driver))
         
         return resume_data
         
@@ -259,52 +383,37 @@ def buy_contacts_and_extract(driver, resume_data):
     # Click buy-contacts button and extract additional contact info
     try:
         # Click the buy-contacts button
-        buy_button = WebDriverWait(driver, 10).until(
-            EC.element_to_be_clickable((By.CSS_SELECTOR, "[data-qa='buy-contacts']"))
+        buy_button = wait_for(
+            driver,
+            EC.element_to_be_clickable((By.CSS_SELECTOR, "[data-qa='buy-contacts']")),
+            "buy contacts button",
+            timeout=10
         )
         driver.execute_script("arguments[0].click();", buy_button)
         print("Buy contacts button clicked")
-        time.sleep(3)
         
-        # Extract all text from resume-serp_resume-item-content, keep only digits
-        contact_info = ""
+        # Contacts are shown once the button is replaced and the page stops loading
         try:
-            # Find the element with contact information
-            contact_elements = driver.find_elements(By.CSS_SELECTOR, "[data-qa='resume-serp_resume-item-content']")
-            if contact_elements:
-                all_digits = []
-                for element in contact_elements:
-                    element_text = element.text.strip()
-                    if element_text:
-                        # Extract only digits from the text
-                        digits = ''.join(filter(str.isdigit, element_text))
-                        if digits:
-                            all_digits.append(digits)
-                contact_info = ''.join(all_digits)
-                print(f"Digits extracted: {contact_info}")
-            else:
-                print("No resume-serp_resume-item-content element found")
-        except Exception as e:
-            print(f"Error extracting contact info: {e}")
+            wait_for(driver, EC.staleness_of(buy_button), "contacts shown", timeout=10)
+        except TimeoutException:
+            print("Buy contacts button still present, waiting for network idle")
+        wait_for_network_idle(driver, "after buying contacts")
+        
+        # Re-extract all data to get updated information after buying contacts
+        fields = extract_fields(driver)
+        
+        # Contact info is in resume-serp_resume-item-content, keep only digits
+        contact_info = ''.join(filter(str.isdigit, fields.get("resume-serp_resume-item-content", "")))
+        if contact_info:
+            print(f"Digits extracted: {contact_info}")
+        else:
+            print("No contact digits found in resume-serp_resume-item-content")
         
         # Update resume data with digits in code column
         updated_data = resume_data.copy()
+        updated_data.update({data_qa: text for data_qa, text in fields.items() if text})
         updated_data["CODE"] = contact_info
         
-        # Re-extract all data to get updated information after buying contacts
-        for data_qa in TARGET_DATA_QA:
-            try:
-                elements = driver.find_elements(By.CSS_SELECTOR, f"[data-qa='{data_qa}']")
-                if elements:
-                    all_text = []
-                    for element in elements:
-                        element_text = element.text.strip()
-                        if element_text:
-                            all_text.append(element_text)
-                    updated_data[data_qa] = "\n".join(all_text)
-            except Exception as e:
-                print(f"Error re-extracting {data_qa}: {e}")
-        
         return updated_data
         
     except Exception as e:
@@ -312,8 +421,8 @@ def buy_contacts_and_extract(driver, resume_data):
         return resume_data
 
 
-def save_to_google_sheets(sheet, data, sheet_name, vacation_text, complience):
-    # Save data to Google Sheets
+def save_to_google_sheets(writer, data, sheet_name, vacation_text, complience):
+    # Queue a row for Google Sheets; the buffered writer sends rows in batches
     try:
         if sheet_name == GOOGLE_WORKSHEET_TEST:
             # For Test_Vacation sheet: [link, code, ...TARGET_DATA_QA]
@@ -327,25 +436,204 @@ def save_to_google_sheets(sheet, data, sheet_name, vacation_text, complience):
             for data_qa in TARGET_DATA_QA:
                 data_row.append(data.get(data_qa, ""))
         
-        # Append row to Google Sheets
-        sheet.append_row(data_row)
+        # Append row to the write buffer
+        writer.append(data_row)
         return True
         
     except Exception as e:
         print(f"Error saving to Google Sheets ({sheet_name}): {e}")
         return False
 
+class RateLimiter:
+    # Spaces out page loads of all browser workers to a shared rate
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_time = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_time - now
+            self._next_time = max(now, self._next_time) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+def scrape_resumes(resume_urls, vacation_text, writer_all, writer_test, driver_factory,
+                   first_driver=None, workers=SCRAPE_WORKERS, score_workers=SCORE_WORKERS,
+                   rate=PAGE_LOADS_PER_SECOND, score_func=None, prefilter_top_k=PREFILTER_TOP_K):
+    # Process resumes with a pool of browser workers pulling from a shared queue.
+    # With the pre-filter on, every PREFILTER_BATCH loaded resumes are ranked against
+    # the vacancy with BM25 and the best of them go to LLM scoring while workers load
+    # the next pages; with prefilter_top_k=None every resume is scored.
+    # Resumes that pass the threshold come back as "buy" tasks for any free worker.
+    if not (vacation_text or "").strip():
+        raise ValueError("Vacancy text is empty: resumes cannot be scored against it")
+    ranker = IncrementalPrefilter(vacation_text, len(resume_urls), top_k=prefilter_top_k) if prefilter_top_k is not None else None
+    url_queue = queue.Queue()
+    for i, url in enumerate(resume_urls):
+        url_queue.put((i, url))
+    buy_queue = queue.Queue()
+
+    if score_func is None:
+        score_func = BatchScorer(SCORE_CACHE_DIR).score
+    limiter = RateLimiter(rate)
+    scorer = ThreadPoolExecutor(max_workers=score_workers)
+    lock = threading.Lock()
+    # Tasks taken by workers plus scores still running
+    state = {"active": 0, "ranked": False}
+    # Extracted resumes waiting for the pre-filter, and all ranked ones by pre-filter number
+    extracted = []
+    ranked = []
+    rank_lock = threading.Lock()
+
+    def finish_task():
+        with lock:
+            state["active"] -= 1
+
+    def take_task():
+        while True:
+            with lock:
+                try:
+                    task = buy_queue.get_nowait()
+                    state["active"] += 1
+                    return ("buy",) + task
+                except queue.Empty:
+                    pass
+                # A full page is ranked before more pages are loaded, so its resumes are
+                # scored meanwhile; once all pages are loaded the last batch closes the
+                # pre-filter and takes up its unused quota
+                done_loading = url_queue.empty() and state["active"] == 0
+                if ranker and (len(extracted) >= PREFILTER_BATCH or (done_loading and not state["ranked"])):
+                    batch = extracted[:]
+                    del extracted[:]
+                    state["ranked"] = done_loading
+                    state["active"] += 1
+                    return ("rank", batch, done_loading)
+                try:
+                    task = url_queue.get_nowait()
+                    state["active"] += 1
+                    return ("extract",) + task
+                except queue.Empty:
+                    pass
+                if state["active"] == 0:
+                    return None
+            # Nothing to do yet, but running scores may still produce buy tasks
+            time.sleep(0.2)
+
+    def on_scored(index, resume_data, future):
+        try:
+            score = future.result()
+            print(f"Resume {index+1} score: {score:.3f}")
+            if score >= SCORE_THRESHOLD:
+                print(f"Score > {SCORE_THRESHOLD}, buying contacts for resume {index+1}")
+                buy_queue.put((index, resume_data, score))
+        except Exception as e:
+            print(f"Error scoring resume {index+1}: {e}")
+        finally:
+            finish_task()
+
+    def process_extract(driver, index, url):
+        print(f"Processing resume {index+1}/{len(resume_urls)}")
+        limiter.wait()
+        resume_data = extract_resume_data(driver, url)
+        if not resume_data:
+            print(f"Failed to extract data for resume {index+1}")
+            return
+
+        if save_to_google_sheets(writer_all, resume_data, GOOGLE_WORKSHEET_ALL, " ", " "):
+            print(f"Resume {index+1} saved to All sheet")
+
+        resume_text = '\n'.join(f"{key}: {value}" for key, value in resume_data.items() if value)
+        if ranker is None:
+            submit_score(index, resume_data, resume_text)
+        else:
+            with lock:
+                extracted.append((index, resume_data, resume_text))
+
+    def submit_score(index, resume_data, resume_text):
+        with lock:
+            state["active"] += 1
+        future = scorer.submit(score_func, resume_text, vacation_text)
+        future.add_done_callback(partial(on_scored, index, resume_data))
+
+    def process_rank(batch, final):
+        documents = ['\n'.join(resume_data.get(data_qa, "") for data_qa in PREFILTER_DATA_QA)
+                     for _, resume_data, _ in batch]
+        # Pre-filter numbers follow the order batches are added in
+        with rank_lock:
+            ranked.extend(batch)
+            selected = ranker.add(documents, final=final)
+        print(f"Pre-filter: {len(selected)} resumes sent to LLM scoring after {len(ranked)} loaded")
+        for number, score in selected:
+            print(f"Resume {ranked[number][0]+1} pre-filter score: {score:.2f}")
+            submit_score(*ranked[number])
+
+    def process_buy(driver, index, resume_data, score):
+        limiter.wait()
+        driver.get(resume_data["link"])
+        updated_data = buy_contacts_and_extract(driver, resume_data)
+        if save_to_google_sheets(writer_test, updated_data, GOOGLE_WORKSHEET_TEST, vacation_text, score):
+            print(f"Resume {index+1} with contacts saved to Test_Vacation sheet")
+
+    def worker(driver):
+        try:
+            while True:
+                task = take_task()
+                if task is None:
+                    break
+                try:
+                    if task[0] == "extract":
+                        process_extract(driver, *task[1:])
+                    elif task[0] == "rank":
+                        process_rank(*task[1:])
+                    else:
+                        process_buy(driver, *task[1:])
+                except Exception as e:
+                    print(f"Error in worker task {task[:2]}: {e}")
+                finally:
+                    finish_task()
+        finally:
+            driver.quit()
+
+    drivers = [first_driver] if first_driver else []
+    while len(drivers) < min(workers, len(resume_urls)):
+        driver = driver_factory()
+        if driver is None:
+            break
+        drivers.append(driver)
+    if not drivers:
+        print("No browser sessions available")
+        scorer.shutdown()
+        return
+
+    print(f"Scraping with {len(drivers)} browser workers")
+    threads = [threading.Thread(target=worker, args=(driver,), daemon=True) for driver in drivers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    scorer.shutdown()
+
 def main():
     # Main function to run the entire process
     
     # Initialize Google Sheets for both worksheets
     sheet_all = init_google_sheets(GOOGLE_WORKSHEET_ALL)
     sheet_test = init_google_sheets(GOOGLE_WORKSHEET_TEST)
-    vacation_text = extract_docx("AI HR\Описание ИТ.docx")
+    vacation_text = DocumentStore().extract(os.path.join("AI HR", "Описание ИТ.docx"))
+    if not (vacation_text or "").strip():
+        print("Vacancy description is empty or could not be read. Exiting.")
+        return
     if not sheet_all or not sheet_test:
         print("Failed to initialize Google Sheets. Exiting.")
         return
     
+    # Rows are sent in batches; close() below flushes whatever is left
+    writer_all = BufferedSheetWriter(sheet_all)
+    writer_test = BufferedSheetWriter(sheet_test)
+    
     driver = setup_driver()
     
     try:
@@ -364,50 +652,45 @@ def main():
         
         print(f"Found {len(resume_urls)} resumes to process")
         
-        # Process each resume
-        for i, url in enumerate(resume_urls):
-            print(f"Processing resume {i+1}/{len(resume_urls)}")
-            
-            # Extract basic resume data
-            resume_data = extract_resume_data(driver, url)
-            if not resume_data:
-                print(f"Failed to extract data for resume {i+1}")
-                continue
-            
-            # Save to All sheet
-            if save_to_google_sheets(sheet_all, resume_data, GOOGLE_WORKSHEET_ALL, " ", " "):
-                print(f"Resume {i+1} saved to All sheet")
-            
-            # Check score and process contacts if needed
-            resume_text = '\n'.join(f"{key}: {value}" for key, value in resume_data.items() if value)
-            score = determine_score(resume_text, vacation_text)
-            print(f"Resume {i+1} score: {score:.3f}")
-            
-            if score >= 0.7:
-                print(f"Score > 0.7, buying contacts for resume {i+1}")
-                
-                # Buy contacts and extract updated data
-                updated_data = buy_contacts_and_extract(driver, resume_data)
-                
-                # Save to Test_Vacation sheet
-                if save_to_google_sheets(sheet_test, updated_data, GOOGLE_WORKSHEET_TEST, vacation_text, score):
-                    print(f"Resume {i+1} with contacts saved to Test_Vacation sheet")
-            
-            # Add delay between processing resumes
-            if i < len(resume_urls) - 1:
-                time.sleep(2)
+        # The logged-in driver becomes the first worker of the pool
+        first_driver, driver = driver, None
+        scrape_resumes(resume_urls, vacation_text, writer_all, writer_test,
+                       create_worker_driver, first_driver=first_driver)
         
         print("All resumes processed. Data saved to Google Sheets")
-        print("Waiting 10 seconds for verification...")
-        time.sleep(10)
+        print_step_timings()
             
     except Exception as e:
         print(f"Error in main process: {e}")
     
     finally:
-        driver.quit()
+        writer_all.close()
+        writer_test.close()
+        if driver:
+            driver.quit()
         print("Driver closed")
 
+def benchmark_extraction(paths, rounds=5):
+    # Compare per-element, single-script and offline extraction on saved HTML fixtures
+    driver = setup_driver()
+    try:
+        for path in paths:
+            driver.get("file://" + os.path.abspath(path))
+            timings = {}
+            for name, extract in (("per-element", extract_fields_per_element),
+                                  ("execute_script", extract_fields),
+                                  ("page_source", lambda d: parse_resume_html(d.page_source))):
+                started = time.perf_counter()
+                for _ in range(rounds):
+                    extract(driver)
+                timings[name] = (time.perf_counter() - started) / rounds * 1000
+            print(path + ": " + ", ".join(f"{name} {ms:.1f} ms" for name, ms in timings.items()))
+    finally:
+        driver.quit()
+
 # Run the main function
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if len(sys.argv) > 2 and sys.argv[1] == "--bench-extract":
+        benchmark_extraction(sys.argv[2:])
+    else:
+        main()
@@ -0,0 +1,237 @@
+import math
+import re
+import time
+import threading
+import logging
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+# Параметры BM25: насыщение частоты термина и нормировка по длине документа
+BM25_K1 = 1.5
+BM25_B = 0.75
+# Слова длиннее обрезаются до основы: грубая замена стемминга для русских окончаний
+STEM_LENGTH = 6
+MIN_TOKEN_LENGTH = 2
+# На оценку LLM уходят не больше TOP_K лучших резюме и только те,
+# чей балл не ниже MIN_RATIO от лучшего; резюме без общих слов с вакансией отсекаются всегда
+PREFILTER_TOP_K = 50
+PREFILTER_MIN_RATIO = 0.2
+
+STOP_WORDS = {
+    "и", "в", "во", "на", "с", "со", "по", "для", "от", "до", "из", "за", "о", "об", "при",
+    "не", "или", "а", "но", "как", "что", "это", "к", "у", "же", "то", "все", "так",
+    "the", "and", "of", "to", "in", "for", "with", "on", "a", "an",
+}
+
+# Латиница и кириллица - разные слова, иначе склеиваются "\\tОпыт" и подобное из выгрузки docx
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#]*|[а-яё0-9]+")
+
+
+def words(text):
+    """Слова текста в нижнем регистре, ё заменена на е"""
+    return _TOKEN_RE.findall((text or "").lower().replace("ё", "е"))
+
+
+def tokenize(text):
+    """Термины текста: слова в нижнем регистре без стоп-слов, длинные - обрезанные до основы"""
+    tokens = []
+    for word in words(text):
+        if len(word) < MIN_TOKEN_LENGTH or word in STOP_WORDS:
+            continue
+        tokens.append(word[:STEM_LENGTH])
+    return tokens
+
+
+class BM25Index:
+    """
+    BM25 по набору документов. Документ хранится как разреженный словарь
+    термин -> частота, поэтому запрос проходит по всем документам за один раз
+    без матриц и внешних зависимостей.
+    """
+
+    def __init__(self, documents=(), k1=BM25_K1, b=BM25_B):
+        self.k1 = k1
+        self.b = b
+        self.term_counts = []
+        self.lengths = []
+        self.avg_length = 0.0
+        self.doc_freq = Counter()
+        self.add(documents)
+
+    def __len__(self):
+        return len(self.term_counts)
+
+    def add(self, documents):
+        """Добавляет документы в индекс; возвращает их номера"""
+        start = len(self.term_counts)
+        for document in documents:
+            counts = Counter(tokenize(document))
+            self.term_counts.append(counts)
+            self.lengths.append(sum(counts.values()))
+            self.doc_freq.update(counts.keys())
+        self.avg_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+        return list(range(start, len(self.term_counts)))
+
+    def idf(self, term):
+        n = len(self.term_counts)
+        df = self.doc_freq.get(term, 0)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def scores(self, query, indexes=None):
+        """
+        Баллы документов по тексту запроса: всех или только с номерами indexes.
+        Каждый термин запроса учитывается один раз.
+        """
+        terms = [term for term in set(tokenize(query)) if term in self.doc_freq]
+        weights = {term: self.idf(term) for term in terms}
+        k1, b = self.k1, self.b
+        avg_length = self.avg_length or 1.0
+        if indexes is None:
+            indexes = range(len(self.term_counts))
+        result = []
+        for i in indexes:
+            counts, length = self.term_counts[i], self.lengths[i]
+            norm = k1 * (1 - b + b * length / avg_length)
+            score = 0.0
+            for term, weight in weights.items():
+                tf = counts.get(term)
+                if tf:
+                    score += weight * tf * (k1 + 1) / (tf + norm)
+            result.append(score)
+        return result
+
+
+def select_for_scoring(scores, top_k=PREFILTER_TOP_K, min_ratio=PREFILTER_MIN_RATIO):
+    """Индексы документов для оценки LLM, от лучшего к худшему"""
+    ranked = sorted((i for i, score in enumerate(scores) if score > 0), key=lambda i: -scores[i])
+    if not ranked:
+        return []
+    if min_ratio:
+        cutoff = scores[ranked[0]] * min_ratio
+        ranked = [i for i in ranked if scores[i] >= cutoff]
+    if top_k:
+        ranked = ranked[:top_k]
+    return ranked
+
+
+def _check_query(query):
+    # Без терминов запроса у всех документов нулевой балл, и отсеялось бы всё
+    if not tokenize(query):
+        raise ValueError("Пустой текст вакансии: резюме не с чем сравнивать")
+
+
+def prefilter(documents, query, top_k=PREFILTER_TOP_K, min_ratio=PREFILTER_MIN_RATIO):
+    """Ранжирует документы по запросу одним проходом; возвращает (отобранные индексы, баллы)"""
+    _check_query(query)
+    started = time.perf_counter()
+    scores = BM25Index(documents).scores(query)
+    selected = select_for_scoring(scores, top_k, min_ratio)
+    logger.info(
+        f"Предотбор BM25: {len(selected)} из {len(documents)} за {(time.perf_counter() - started) * 1000:.0f} мс"
+    )
+    return selected, scores
+
+
+class IncrementalPrefilter:
+    """
+    Предотбор по мере загрузки: документы приходят пачками, и каждая пачка
+    ранжируется сразу, не дожидаясь остальных, чтобы оценка LLM шла параллельно
+    с загрузкой. Статистика BM25 копится по всем пришедшим документам.
+    Пачке достаётся доля top_k, пропорциональная числу пришедших из expected
+    документов, а порог min_ratio считается от лучшего балла на этот момент.
+    Документы сверх доли откладываются: последняя пачка (final=True) добирает
+    остаток лимита из лучших отложенных.
+    """
+
+    def __init__(self, query, expected=None, top_k=PREFILTER_TOP_K, min_ratio=PREFILTER_MIN_RATIO):
+        _check_query(query)
+        self.query = query
+        self.expected = expected
+        self.top_k = top_k
+        self.min_ratio = min_ratio
+        self.index = BM25Index()
+        self.best = 0.0
+        self.selected = 0
+        self._deferred = []
+        self._lock = threading.Lock()
+
+    def add(self, documents, final=False):
+        """
+        Добавляет пачку документов. Возвращает [(номер документа, балл)] для оценки
+        от лучшего к худшему; номера документов сквозные по всем пачкам.
+        """
+        with self._lock:
+            started = time.perf_counter()
+            candidates = self.index.add(documents)
+            if final:
+                candidates += self._deferred
+                self._deferred = []
+            scores = dict(zip(candidates, self.index.scores(self.query, candidates)))
+            self.best = max([self.best, *scores.values()])
+
+            cutoff = self.best * self.min_ratio if self.min_ratio else 0.0
+            ranked = sorted((i for i in candidates if scores[i] > 0 and scores[i] >= cutoff), key=lambda i: -scores[i])
+            quota = len(ranked)
+            if self.top_k:
+                share = 1.0 if final or not self.expected else min(1.0, len(self.index) / self.expected)
+                quota = max(0, math.ceil(self.top_k * share) - self.selected)
+            selected = ranked[:quota]
+            self._deferred.extend(ranked[quota:])
+            self.selected += len(selected)
+            logger.info(
+                f"Предотбор BM25: {len(selected)} из {len(documents)} новых, всего {self.selected} из {len(self.index)} "
+                f"за {(time.perf_counter() - started) * 1000:.0f} мс"
+            )
+            return [(i, scores[i]) for i in selected]
+
+
+def _synthetic_corpus(count, seed=1):
+    """Вакансия и резюме из общего словаря; каждое десятое резюме по профилю вакансии"""
+    import random
+
+    rng = random.Random(seed)
+    profile = ["python", "django", "postgresql", "docker", "kubernetes", "микросервисы", "разработка", "api"]
+    other = [f"навык{i}" for i in range(2000)] + ["продажи", "бухгалтерия", "склад", "логистика", "маркетинг"]
+    vacancy = " ".join(profile + rng.sample(other, 20))
+    resumes = []
+    for i in range(count):
+        resume_words = rng.sample(other, 150)
+        if i % 10 == 0:
+            resume_words += rng.sample(profile, 6) * 2
+        resumes.append(" ".join(resume_words))
+    return vacancy, resumes
+
+
+def _benchmark(count=400, delay=0.1, workers=4):
+    """Число вызовов LLM и время оценки: все резюме против предотбора BM25 (заглушка LLM с задержкой)"""
+    from functools import partial
+    import http_client
+    from scoring import BatchScorer, determine_score
+
+    vacancy, resumes = _synthetic_corpus(count)
+    server, url = http_client._start_stub_server(delay, answer="75")
+    scorer = BatchScorer(None, workers, partial(determine_score, url=url))
+
+    started = time.perf_counter()
+    for _ in scorer.score_many([(resume, vacancy) for resume in resumes]):
+        pass
+    everything = time.perf_counter() - started
+
+    started = time.perf_counter()
+    selected, _ = prefilter(resumes, vacancy)
+    ranking = time.perf_counter() - started
+    for _ in scorer.score_many([(resumes[i], vacancy) for i in selected]):
+        pass
+    filtered = time.perf_counter() - started
+
+    server.shutdown()
+    relevant = sum(1 for i in selected if i % 10 == 0)
+    print(f"{count} резюме, задержка LLM {delay} с, {workers} потока")
+    print(f"Без предотбора: {count} вызовов LLM, {everything:.2f} с")
+    print(f"С предотбором: {len(selected)} вызовов LLM ({relevant} из {count // 10} подходящих), "
+          f"{filtered:.2f} с, из них BM25 {ranking * 1000:.0f} мс")
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -0,0 +1,205 @@
+import hashlib
+import json
+import os
+import threading
+import logging
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import http_client
+
+logger = logging.getLogger(__name__)
+
+# Конфиг (замени своими значениями)
+YC_GPT_URL = "https://llm.api.cloud.yandex.net/foundationModels/v1/completion"
+YC_FOLDER_ID = os.getenv("YC_FOLDER_ID", "b1gvjms07lsr4hfhq8v3")
+YC_API_KEY = os.getenv("YC_API_KEY", "AQVNzGQyyfsE_0ScOUIqgCbaDjPBQjYEBL7-h_i3")
+
+SCORE_MODEL = "yandexgpt/latest"
+SCORE_PROMPT = (
+    "Ты HR-специалист. Сравни резюме и вакансию и оцени, "
+    "насколько кандидат подходит. Верни только число процентов (0–100)."
+)
+# Одновременных запросов к LLM при пакетной оценке
+SCORE_WORKERS = 4
+
+ScoreResult = namedtuple("ScoreResult", ["index", "score", "error", "cached"])
+
+
+def determine_score(resume_text: str, vacancy_text: str, url=None) -> float:
+    """
+    Анализ резюме против вакансии через YandexGPT.
+    Возвращает соответствие от 0.0 до 1.0.
+    """
+    headers = {
+        "Authorization": f"Api-Key {YC_API_KEY}",
+        "Content-Type": "application/json",
+    }
+    data = {
+        "modelUri": f"gpt://{YC_FOLDER_ID}/{SCORE_MODEL}",
+        "completionOptions": {
+            "stream": False,
+            "temperature": 0.2,
+            "maxTokens": 1000
+        },
+        "messages": [
+            {
+                "role": "system",
+                "text": SCORE_PROMPT
+            },
+            {
+                "role": "user",
+                "text": f"Вакансия:\n{vacancy_text}\n\nРезюме:\n{resume_text}"
+            }
+        ]
+    }
+
+    resp = http_client.post("score", url or YC_GPT_URL, headers=headers, data=json.dumps(data))
+    resp.raise_for_status()
+    result = resp.json()
+
+    # Достаём текст ответа
+    answer = result["result"]["alternatives"][0]["message"]["text"]
+
+    # Пробуем выделить число
+    try:
+        percent = int("".join(ch for ch in answer if ch.isdigit()))
+        # Преобразуем проценты в дробное число от 0.0 до 1.0
+        return max(0.0, min(1.0, percent / 100.0))
+    except ValueError:
+        return 0.0
+
+
+def score_key(resume_text, vacancy_text):
+    """Ключ кеша: хеш модели, промпта и текстов"""
+    raw = "\x1f".join([SCORE_MODEL, SCORE_PROMPT, vacancy_text or "", resume_text or ""])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ScoreCache:
+    """Оценки на диске по хешу содержимого: одна и та же пара не оценивается дважды"""
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+    def get(self, key):
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                return json.load(f)["score"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def put(self, key, score):
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"score": score}, f)
+        os.replace(tmp_path, path)
+
+    def _path(self, key):
+        return os.path.join(self.root, f"{key}.json")
+
+
+class BatchScorer:
+    """
+    Оценка пар (резюме, вакансия) с общим кешем. score() - одна пара,
+    score_many() - много пар: одинаковые пары оцениваются один раз, запросы
+    идут параллельно (не больше workers), результаты отдаются по мере готовности.
+    """
+
+    def __init__(self, cache_dir="score_cache", workers=SCORE_WORKERS, score_func=determine_score):
+        self.cache = ScoreCache(cache_dir) if cache_dir else None
+        self.workers = workers
+        self.score_func = score_func
+
+    def score(self, resume_text, vacancy_text):
+        """Оценка одной пары с учётом кеша"""
+        key = score_key(resume_text, vacancy_text)
+        if self.cache:
+            score = self.cache.get(key)
+            if score is not None:
+                return score
+        score = self.score_func(resume_text, vacancy_text)
+        if self.cache:
+            self.cache.put(key, score)
+        return score
+
+    def score_many(self, pairs):
+        """
+        Генератор ScoreResult(index, score, error, cached) для пар (резюме, вакансия)
+        в порядке готовности; index - номер пары во входном списке.
+        """
+        # Одинаковые пары объединяем, уже оценённые отдаём сразу из кеша
+        indexes_by_key = {}
+        texts_by_key = {}
+        for index, (resume_text, vacancy_text) in enumerate(pairs):
+            key = score_key(resume_text, vacancy_text)
+            indexes_by_key.setdefault(key, []).append(index)
+            texts_by_key[key] = (resume_text, vacancy_text)
+
+        pending = []
+        for key, indexes in indexes_by_key.items():
+            score = self.cache.get(key) if self.cache else None
+            if score is None:
+                pending.append(key)
+                continue
+            for index in indexes:
+                yield ScoreResult(index, score, None, True)
+
+        if not pending:
+            return
+
+        logger.info(f"Пар на оценку: {len(pending)} (всего {sum(map(len, indexes_by_key.values()))})")
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {pool.submit(self.score_func, *texts_by_key[key]): key for key in pending}
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    score, error = future.result(), None
+                except Exception as e:
+                    score, error = None, e
+                    logger.error(f"Ошибка оценки резюме: {e}")
+                if error is None and self.cache:
+                    self.cache.put(key, score)
+                for index in indexes_by_key[key]:
+                    yield ScoreResult(index, score, error, False)
+
+
+def _benchmark(resumes=20, vacancies=3, delay=0.2, workers=SCORE_WORKERS):
+    """Последовательная оценка против пакетной на локальной заглушке LLM с задержкой"""
+    import tempfile
+    import time
+    from functools import partial
+
+    server, url = http_client._start_stub_server(delay, answer="75")
+    score_func = partial(determine_score, url=url)
+    # Каждое резюме встречается дважды, как при повторном поиске
+    pairs = [(f"Резюме {r % (resumes // 2)}", f"Вакансия {v}") for r in range(resumes) for v in range(vacancies)]
+
+    started = time.perf_counter()
+    for resume_text, vacancy_text in pairs:
+        score_func(resume_text, vacancy_text)
+    sequential = time.perf_counter() - started
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        scorer = BatchScorer(cache_dir, workers, score_func)
+        started = time.perf_counter()
+        first_result = None
+        for _ in scorer.score_many(pairs):
+            if first_result is None:
+                first_result = time.perf_counter() - started
+        batch = time.perf_counter() - started
+
+        started = time.perf_counter()
+        cached = sum(1 for result in scorer.score_many(pairs) if result.cached)
+        repeat = time.perf_counter() - started
+
+    server.shutdown()
+    print(f"{len(pairs)} пар, задержка LLM {delay} с")
+    print(f"Последовательно: {sequential:.2f} с")
+    print(f"Пакетно ({workers} потока): {batch:.2f} с, первый результат через {first_result:.2f} с")
+    print(f"Повтор из кеша: {repeat * 1000:.1f} мс, из кеша {cached} пар")
+
+
+if __name__ == "__main__":
+    _benchmark()
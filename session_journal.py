@@ -0,0 +1,107 @@
+import json
+import os
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SessionJournal:
+    """
+    Журнал сессий собеседования в формате append-only (одна JSON-запись на строку).
+    На каждое изменение дописывается только запись изменённой сессии,
+    при разрастании журнала он сжимается до одного снимка на живую сессию.
+    """
+
+    def __init__(self, path, legacy_path=None, compact_ratio=4, min_records=200):
+        self.path = path
+        self.legacy_path = legacy_path
+        self.compact_ratio = compact_ratio
+        self.min_records = min_records
+        self.sessions = {}
+        self._records = 0
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Восстанавливает состояние сессий, проигрывая журнал"""
+        with self._lock:
+            self.sessions = {}
+            self._records = 0
+
+            if not os.path.exists(self.path):
+                self._import_legacy()
+                return self.sessions
+
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Недописанная строка после аварийного завершения
+                        logger.warning("Пропущена повреждённая запись журнала сессий")
+                        continue
+
+                    self._records += 1
+                    if record.get('op') == 'put':
+                        self.sessions[record['id']] = record['data']
+                    elif record.get('op') == 'del':
+                        self.sessions.pop(record['id'], None)
+
+            if self._needs_compaction():
+                self._compact()
+            return self.sessions
+
+    def put(self, session_id, data):
+        """Записывает актуальное состояние одной сессии"""
+        with self._lock:
+            self.sessions[session_id] = data
+            self._append({'op': 'put', 'id': session_id, 'data': data})
+
+    def delete(self, session_id):
+        """Помечает сессию удалённой"""
+        with self._lock:
+            self.sessions.pop(session_id, None)
+            self._append({'op': 'del', 'id': session_id})
+
+    def compact(self):
+        """Переписывает журнал одним снимком на каждую живую сессию"""
+        with self._lock:
+            self._compact()
+
+    def _append(self, record):
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        # Одна запись = один write, чтобы строки разных потоков не перемешивались
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line)
+        self._records += 1
+
+        if self._needs_compaction():
+            self._compact()
+
+    def _needs_compaction(self):
+        return self._records > max(self.min_records, self.compact_ratio * len(self.sessions))
+
+    def _compact(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for session_id, data in list(self.sessions.items()):
+                f.write(json.dumps({'op': 'put', 'id': session_id, 'data': data}, ensure_ascii=False) + '\n')
+        os.replace(tmp_path, self.path)
+        self._records = len(self.sessions)
+        logger.info(f"Журнал сессий сжат: {self._records} сессий")
+
+    def _import_legacy(self):
+        # Переносим данные из старого session_store.json, если он есть
+        if not self.legacy_path or not os.path.exists(self.legacy_path):
+            return
+        try:
+            with open(self.legacy_path, 'r') as f:
+                self.sessions = json.load(f)
+            self._compact()
+            logger.info(f"Импортировано {len(self.sessions)} сессий из {self.legacy_path}")
+        except Exception as e:
+            logger.error(f"Ошибка импорта хранилища сессий: {e}")
+            self.sessions = {}
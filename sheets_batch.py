@@ -0,0 +1,190 @@
+import atexit
+import time
+import threading
+import logging
+from code_index import column_letter
+
+logger = logging.getLogger(__name__)
+
+# Коды ответа Sheets API, при которых запрос стоит повторить (квота и сбои сервера)
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def is_retryable(error):
+    """Ошибка gspread из-за квоты или временного сбоя API"""
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None) in RETRY_STATUS_CODES
+
+
+def call_with_retry(func, *args, max_retries=5, backoff=2.0, **kwargs):
+    """Вызывает метод листа, повторяя его с экспоненциальной паузой при ошибках квоты"""
+    for attempt in range(max_retries + 1):
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            if attempt == max_retries or not is_retryable(e):
+                raise
+            delay = backoff * (2 ** attempt)
+            logger.warning(f"Ошибка Sheets API ({e}), повтор через {delay:.0f} с")
+            time.sleep(delay)
+
+
+class BufferedSheetWriter:
+    """
+    Буфер строк для листа Google Sheets: строки копятся и отправляются одним
+    append_rows по достижении max_rows или через max_delay секунд после первой
+    строки в буфере. Остаток отправляется при close() и при завершении процесса.
+    Работает с любым объектом, у которого есть append_rows(rows).
+    """
+
+    def __init__(self, sheet, max_rows=50, max_delay=10.0, max_retries=5, backoff=2.0):
+        self.sheet = sheet
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._rows = []
+        self._first_row_at = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._timer = threading.Thread(target=self._flush_periodically, daemon=True)
+        self._timer.start()
+        atexit.register(self.close)
+
+    def append(self, row):
+        """Добавляет строку в буфер"""
+        with self._lock:
+            self._rows.append(list(row))
+            if self._first_row_at is None:
+                self._first_row_at = time.monotonic()
+            full = len(self._rows) >= self.max_rows
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Отправляет накопленные строки одним запросом"""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+                self._first_row_at = None
+            if not rows:
+                return 0
+
+            try:
+                call_with_retry(self.sheet.append_rows, rows,
+                                max_retries=self.max_retries, backoff=self.backoff)
+            except Exception as e:
+                logger.error(f"Не удалось записать {len(rows)} строк в Google Sheets: {e}")
+                # Возвращаем строки в начало буфера, чтобы не потерять их
+                with self._lock:
+                    self._rows = rows + self._rows
+                    if self._first_row_at is None:
+                        self._first_row_at = time.monotonic()
+                return 0
+
+            logger.info(f"Записано строк в Google Sheets: {len(rows)}")
+            return len(rows)
+
+    def close(self):
+        """Останавливает фоновую отправку и сбрасывает остаток буфера"""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self.flush()
+        atexit.unregister(self.close)
+        with self._lock:
+            if self._rows:
+                logger.error(f"При закрытии не записано строк: {len(self._rows)}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _flush_periodically(self):
+        interval = max(self.max_delay / 2, 0.1)
+        while not self._closed.wait(interval):
+            with self._lock:
+                due = self._first_row_at is not None and time.monotonic() - self._first_row_at >= self.max_delay
+            if due:
+                self.flush()
+
+
+class SheetCellBatcher:
+    """
+    Объединяет обновления отдельных ячеек в один batch_update.
+    Позиции столбцов берутся из строки заголовков, которая читается один раз.
+    """
+
+    def __init__(self, sheet, headers=None, value_input_option="USER_ENTERED", max_retries=5, backoff=2.0):
+        self.sheet = sheet
+        self.value_input_option = value_input_option
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._headers = list(headers) if headers else None
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def column(self, name, create=False):
+        """Номер столбца (с 1) по заголовку; при create=True столбец добавляется"""
+        with self._lock:
+            return self._column(name, create)
+
+    def set(self, row, name, value, create_column=False):
+        """Ставит значение ячейки в очередь на запись"""
+        with self._lock:
+            col = self._column(name, create_column)
+            self._pending[(row, col)] = value
+
+    def update_row(self, row, values, create_columns=False):
+        """Записывает несколько ячеек строки одним запросом"""
+        with self._lock:
+            # Сначала проверяем все столбцы, чтобы не записать строку частично
+            columns = {name: self._column(name, create_columns) for name in values}
+            for name, value in values.items():
+                self._pending[(row, columns[name])] = value
+        return self.flush()
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self):
+        """Отправляет все накопленные ячейки одним batch_update"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        data = [
+            {"range": f"{column_letter(col)}{row}", "values": [[value]]}
+            for (row, col), value in pending.items()
+        ]
+        try:
+            call_with_retry(self.sheet.batch_update, data,
+                            value_input_option=self.value_input_option,
+                            max_retries=self.max_retries, backoff=self.backoff)
+        except Exception:
+            # Не теряем изменения: более новые значения тех же ячеек имеют приоритет
+            with self._lock:
+                pending.update(self._pending)
+                self._pending = pending
+            raise
+        return len(data)
+
+    def _column(self, name, create):
+        if self._headers is None:
+            self._headers = call_with_retry(self.sheet.row_values, 1,
+                                            max_retries=self.max_retries, backoff=self.backoff)
+        if name in self._headers:
+            return self._headers.index(name) + 1
+        if not create:
+            raise ValueError(f"Столбец {name} не найден")
+
+        # Новый заголовок записывается вместе с остальными ячейками
+        self._headers.append(name)
+        col = len(self._headers)
+        self._pending[(1, col)] = name
+        return col
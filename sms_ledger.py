@@ -0,0 +1,122 @@
+import sqlite3
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Статусы приглашения
+PENDING = "pending"    # найдено в таблице, ещё не отправлялось
+SENDING = "sending"    # запрос к Twilio начат, результат неизвестен
+SENT = "sent"          # SMS отправлено, отметка в таблицу ещё не записана
+MARKED = "marked"      # отметка SMS_SENT есть в таблице
+FAILED = "failed"      # Twilio вернул ошибку, при следующем запуске отправка повторится
+
+
+class CampaignLedger:
+    """
+    Локальный журнал SMS-рассылки в SQLite: статус приглашения для каждого кода
+    кандидата и курсор - номер следующей ещё не прочитанной строки таблицы.
+    Повторный запуск продолжает с курсора и не отправляет SMS дважды.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS invitations (
+                code TEXT PRIMARY KEY,
+                row INTEGER,
+                phone TEXT,
+                vacancy TEXT,
+                name TEXT,
+                status TEXT,
+                attempts INTEGER DEFAULT 0,
+                error TEXT DEFAULT '',
+                updated_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS checkpoint (
+                key TEXT PRIMARY KEY,
+                value INTEGER
+            );
+            """
+        )
+        self._conn.commit()
+
+    def cursor(self, default=2):
+        """Номер строки таблицы, с которой продолжать чтение"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM checkpoint WHERE key = 'cursor'").fetchone()
+        return row["value"] if row else default
+
+    def add_batch(self, candidates, next_row, marked_codes=()):
+        """
+        Добавляет прочитанных кандидатов и сдвигает курсор в одной транзакции.
+        Уже известные коды не изменяются, коды из marked_codes сразу считаются отмеченными.
+        Возвращает число добавленных записей.
+        """
+        marked_codes = {str(code) for code in marked_codes}
+        now = time.time()
+        added = 0
+        with self._lock, self._conn:
+            for candidate in candidates:
+                code = str(candidate["code"])
+                status = MARKED if code in marked_codes else PENDING
+                added += self._conn.execute(
+                    """
+                    INSERT OR IGNORE INTO invitations (code, row, phone, vacancy, name, status, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (code, candidate["row"], candidate["phone"],
+                     candidate["vacancy"], candidate["name"], status, now),
+                ).rowcount
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoint (key, value) VALUES ('cursor', ?)", (next_row,)
+            )
+        return added
+
+    def candidates(self, *statuses):
+        """Кандидаты с указанными статусами в порядке строк таблицы"""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM invitations WHERE status IN ({', '.join('?' * len(statuses))}) ORDER BY row",
+                statuses,
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def set_status(self, code, status, error=""):
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                UPDATE invitations
+                SET status = ?, error = ?, updated_at = ?, attempts = attempts + (? = 'sending')
+                WHERE code = ?
+                """,
+                (status, error, time.time(), status, str(code)),
+            )
+
+    def mark_written(self):
+        """Все отправленные приглашения отмечены в таблице"""
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                "UPDATE invitations SET status = ?, updated_at = ? WHERE status = ?",
+                (MARKED, time.time(), SENT),
+            )
+        return cur.rowcount
+
+    def stats(self):
+        """Число приглашений по статусам"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) AS count FROM invitations GROUP BY status"
+            ).fetchall()
+        return {row["status"]: row["count"] for row in rows}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,8 +1,15 @@
 from twilio.rest import Client
 from google.oauth2.service_account import Credentials
 import gspread
+import sys
 import time
 import logging
+import threading
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from sheets_batch import SheetCellBatcher, call_with_retry
+from code_index import column_letter
+from sms_ledger import CampaignLedger, PENDING, SENDING, SENT, FAILED
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -21,6 +28,66 @@ GOOGLE_WORKSHEET = 'Demo'
 # Конфигурация сайта
 SITE_LINK = ''
 
+# Журнал рассылки: статусы приглашений и курсор чтения таблицы
+SMS_LEDGER_FILE = 'sms_campaign.sqlite3'
+# Сколько строк таблицы читать за один запрос
+SHEET_CHUNK_ROWS = 500
+
+# Сколько отметок об отправке копить перед записью в таблицу одним запросом
+MARKS_FLUSH_SIZE = 100
+
+# Пропускная способность номера-отправителя (SMS в секунду) и допустимый всплеск.
+# У Twilio это около 1 SMS/с для обычного номера, 3 для toll-free, до 100 для short code
+SMS_RATE_PER_SECOND = 1.0
+SMS_BURST = 1
+# Число одновременных запросов к Twilio
+SMS_WORKERS = 8
+
+_twilio_client = None
+_twilio_client_lock = threading.Lock()
+
+
+class TokenBucket:
+    """Ведро токенов: в среднем не больше rate отправок в секунду и не больше burst подряд"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+
+
+class FakeTwilioClient:
+    """Локальная заглушка Twilio для нагрузочного теста: отвечает с задержкой сети"""
+
+    def __init__(self, latency=0.02):
+        self.messages = self
+        self.latency = latency
+        self.sent = 0
+        self._lock = threading.Lock()
+
+    def create(self, body, from_, to):
+        time.sleep(self.latency)
+        with self._lock:
+            self.sent += 1
+            return SimpleNamespace(sid=f"SMfake{self.sent:08d}")
+
+
 def init_google_sheets():
     """Инициализирует подключение к Google Sheets"""
     try:
@@ -34,15 +101,32 @@ def init_google_sheets():
         logger.error(f"Ошибка инициализации Google Sheets: {e}")
         return None
 
-def get_candidates_data(sheet):
-    """Получает данные кандидатов из таблицы"""
-    try:
-        # Получаем все записи
-        records = sheet.get_all_records()
+def get_candidates_data(sheet, headers, start_row=2, chunk_size=SHEET_CHUNK_ROWS):
+    """
+    Читает кандидатов из таблицы порциями, начиная со строки start_row, до конца листа.
+    Для каждой порции возвращает кандидатов, коды уже отмеченных SMS_SENT,
+    номер следующей строки, первую заполненную строку без телефона или кода
+    и последнюю заполненную строку порции (None, если таких нет).
+    """
+    last_column = column_letter(len(headers))
+    # API не возвращает пустые строки в конце диапазона, поэтому короткая порция
+    # ещё не конец листа: читаем до числа строк листа
+    row_count = sheet.row_count
+    row = start_row
+    while row <= row_count:
+        end_row = min(row + chunk_size - 1, row_count)
+        values = call_with_retry(sheet.get_values, f"A{row}:{last_column}{end_row}")
         
         candidates = []
-        for i, record in enumerate(records, start=2):
-            # Проверяем, что есть номер телефона и код не использовался
+        marked_codes = []
+        first_skipped = None
+        last_filled = None
+        for i, values_row in enumerate(values, start=row):
+            if not any(values_row):
+                continue
+            last_filled = i
+            record = dict(zip(headers, values_row))
+            # Проверяем, что есть номер телефона и код
             phone = record.get('resume-personal-phone', '') or record.get('phone', '') or record.get('телефон', '')
             code = record.get('CODE', '')
             vacancy = record.get('VACATION-TEXT', '') or record.get('vacancy', '') or record.get('вакансия', '')
@@ -58,11 +142,35 @@ def get_candidates_data(sheet):
                         'vacancy': vacancy,
                         'name': record.get('resume-personal-name', '') or record.get('name', '') or 'Кандидат'
                     })
+                    if record.get('SMS_SENT'):
+                        marked_codes.append(code)
+            elif first_skipped is None:
+                first_skipped = i
         
-        return candidates
+        row = end_row + 1
+        yield candidates, marked_codes, row, first_skipped, last_filled
+
+def sync_ledger(sheet, ledger, headers, rescan=False):
+    """Заносит в журнал кандидатов из строк, добавленных после прошлого запуска"""
+    start_row = 2 if rescan else ledger.cursor()
+    found = 0
+    # Курсор не уходит дальше первой строки без телефона или кода (её могут заполнить
+    # позже) и дальше последней заполненной строки (новые строки допишут после нее).
+    # Следующий запуск прочитает эти строки снова, известные коды журнал не дублирует
+    stop_row = None
+    resume_row = start_row
+    try:
+        for candidates, marked_codes, _, first_skipped, last_filled in get_candidates_data(sheet, headers, start_row):
+            if stop_row is None:
+                stop_row = first_skipped
+            if last_filled is not None:
+                resume_row = last_filled + 1
+            # Курсор сдвигается вместе с записью порции, поэтому после сбоя чтение продолжится с нее
+            found += ledger.add_batch(candidates, stop_row or resume_row, marked_codes)
     except Exception as e:
         logger.error(f"Ошибка получения данных кандидатов: {e}")
-        return []
+    logger.info(f"Прочитаны строки таблицы с {start_row}, новых записей с телефоном и кодом: {found}")
+    return found
 
 def clean_phone_number(phone):
     """Очищает номер телефона от лишних символов и приводит к международному формату"""
@@ -87,14 +195,21 @@ def clean_phone_number(phone):
         logger.error(f"Ошибка очистки номера {phone}: {e}")
         return None
 
-def send_sms(text, receiver):
+def get_twilio_client():
+    """Общий клиент Twilio: соединение с API переиспользуется между отправками"""
+    global _twilio_client
+    if _twilio_client is None:
+        with _twilio_client_lock:
+            if _twilio_client is None:
+                _twilio_client = Client(SID, AUTH_TOKEN)
+    return _twilio_client
+
+def send_sms(text, receiver, client=None):
     """Отправляет SMS через Twilio"""
     try:
-        account_sid = SID
-        auth_token = AUTH_TOKEN
         sender_number = SYS_NUMBER
 
-        client = Client(account_sid, auth_token)
+        client = client or get_twilio_client()
 
         message = client.messages.create(
             body=text,
@@ -126,22 +241,15 @@ def generate_sms_text(candidate_name, vacancy, code):
 
     return message
 
-def mark_as_sent(sheet, row):
-    """Помечает кандидата как отправленного (добавляет отметку в таблицу)"""
+def mark_as_sent(cell_writer, row, sent_at=None):
+    """Помечает кандидата как отправленного (отметка копится и пишется пакетом)"""
     try:
-        # Предположим, что у нас есть колонка "SMS_SENT" или создаем ее
-        headers = sheet.row_values(1)
-        
-        if "SMS_SENT" not in headers:
-            # Добавляем новую колонку если ее нет
-            sms_sent_col = len(headers) + 1
-            sheet.update_cell(1, sms_sent_col, "SMS_SENT")
-        else:
-            sms_sent_col = headers.index("SMS_SENT") + 1
+        # Колонка SMS_SENT создается при первой отметке, если ее нет
+        timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(sent_at))
+        cell_writer.set(row, "SMS_SENT", f"Отправлено {timestamp}", create_column=True)
         
-        # Помечаем как отправлено с timestamp
-        timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
-        sheet.update_cell(row, sms_sent_col, f"Отправлено {timestamp}")
+        if cell_writer.pending_count() >= MARKS_FLUSH_SIZE:
+            cell_writer.flush()
         
         logger.info(f"Кандидат в строке {row} помечен как отправленный")
         return True
@@ -150,7 +258,58 @@ def mark_as_sent(sheet, row):
         logger.error(f"Ошибка пометки кандидата в строке {row}: {e}")
         return False
 
-def main():
+def dispatch_invitations(candidates, cell_writer, client=None, workers=SMS_WORKERS,
+                         rate=SMS_RATE_PER_SECOND, burst=SMS_BURST, ledger=None):
+    """
+    Рассылает приглашения пулом потоков. Темп отправки задаёт общее ведро токенов,
+    отметки об успешной отправке пишутся в таблицу пакетами из основного потока.
+    Если передан журнал, статус каждого приглашения сохраняется в нем.
+    """
+    bucket = TokenBucket(rate, burst)
+
+    def send(candidate):
+        sms_text = generate_sms_text(
+            candidate['name'],
+            candidate['vacancy'],
+            candidate['code']
+        )
+        bucket.acquire()
+        if ledger:
+            ledger.set_status(candidate['code'], SENDING)
+        logger.info(f"Отправка SMS на {candidate['phone']}...")
+        return send_sms(sms_text, candidate['phone'], client)
+
+    success_count = 0
+    fail_count = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(send, candidate): candidate for candidate in candidates}
+        for future in as_completed(futures):
+            candidate = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                fail_count += 1
+                logger.error(f"Ошибка обработки кандидата {candidate['phone']}: {e}")
+                if ledger:
+                    ledger.set_status(candidate['code'], FAILED, str(e))
+                continue
+
+            if "успешно" in result.lower():
+                if ledger:
+                    ledger.set_status(candidate['code'], SENT)
+                # Помечаем как отправленного
+                mark_as_sent(cell_writer, candidate['row'])
+                success_count += 1
+                logger.info(f"✓ Успешно отправлено: {candidate['phone']}")
+            else:
+                fail_count += 1
+                logger.error(f"✗ Ошибка: {candidate['phone']} - {result}")
+                if ledger:
+                    ledger.set_status(candidate['code'], FAILED, result)
+
+    return success_count, fail_count
+
+def main(rescan=False):
     """Основная функция скрипта"""
     logger.info("Запуск скрипта рассылки SMS...")
     
@@ -160,49 +319,41 @@ def main():
         logger.error("Не удалось подключиться к Google Sheets")
         return
     
-    # Получаем данные кандидатов
-    candidates = get_candidates_data(sheet)
+    ledger = CampaignLedger(SMS_LEDGER_FILE)
+    headers = call_with_retry(sheet.row_values, 1)
+    
+    # Дочитываем новые строки таблицы в журнал
+    sync_ledger(sheet, ledger, headers, rescan)
+    
+    # Отметки об отправке пишутся пакетами
+    cell_writer = SheetCellBatcher(sheet, headers=headers)
+    
+    # Приглашения, отправленные в прошлый раз, но не отмеченные в таблице
+    for candidate in ledger.candidates(SENT):
+        mark_as_sent(cell_writer, candidate['row'], candidate['updated_at'])
+    
+    # Статус неизвестен, если прошлый запуск прервался во время запроса к Twilio.
+    # Такие приглашения не отправляются повторно, чтобы кандидат не получил SMS дважды
+    unknown = ledger.candidates(SENDING)
+    if unknown:
+        logger.warning(f"Приглашений с неизвестным результатом отправки: {len(unknown)}, "
+                       f"проверьте их в журнале Twilio (строки {', '.join(str(c['row']) for c in unknown)})")
+    
+    candidates = ledger.candidates(PENDING, FAILED)
     if not candidates:
         logger.warning("Не найдено кандидатов для рассылки")
-        return
-    
-    logger.info(f"Найдено {len(candidates)} кандидатов для рассылки")
+    else:
+        logger.info(f"Найдено {len(candidates)} кандидатов для рассылки")
     
-    # Счетчики для статистики
-    success_count = 0
-    fail_count = 0
+    # Отправляем приглашения
+    success_count, fail_count = dispatch_invitations(candidates, cell_writer, ledger=ledger)
     
-    # Проходим по всем кандидатам
-    for candidate in candidates:
-        try:
-            # Генерируем текст сообщения
-            sms_text = generate_sms_text(
-                candidate['name'],
-                candidate['vacancy'],
-                candidate['code']
-            )
-            
-            logger.info(f"Отправка SMS на {candidate['phone']}...")
-            
-            # Отправляем SMS
-            result = send_sms(sms_text, candidate['phone'])
-            
-            if "успешно" in result.lower():
-                # Помечаем как отправленного
-                mark_as_sent(sheet, candidate['row'])
-                success_count += 1
-                logger.info(f"✓ Успешно отправлено: {candidate['phone']}")
-            else:
-                fail_count += 1
-                logger.error(f"✗ Ошибка: {candidate['phone']} - {result}")
-            
-            # Пауза между отправками чтобы не превысить лимиты Twilio
-            time.sleep(1)
-            
-        except Exception as e:
-            fail_count += 1
-            logger.error(f"Ошибка обработки кандидата {candidate['phone']}: {e}")
-            continue
+    # Записываем оставшиеся отметки
+    try:
+        cell_writer.flush()
+        ledger.mark_written()
+    except Exception as e:
+        logger.error(f"Ошибка записи отметок об отправке: {e}")
     
     # Выводим итоговую статистику
     logger.info("=" * 50)
@@ -210,13 +361,49 @@ def main():
     logger.info(f"Успешно отправлено: {success_count}")
     logger.info(f"Не удалось отправить: {fail_count}")
     logger.info(f"Всего обработано: {len(candidates)}")
+    logger.info(f"Статусы в журнале: {ledger.stats()}")
     logger.info("=" * 50)
+    ledger.close()
+
+def benchmark_dispatch(count=10000, rate=500.0, latency=0.02, workers=SMS_WORKERS):
+    """Прогон рассылки на заглушках Twilio и таблицы без реальной отправки"""
+    class FakeSheet:
+        def __init__(self):
+            self.requests = 0
+
+        def row_values(self, row):
+            self.requests += 1
+            return ['CODE', 'resume-personal-phone']
+
+        def batch_update(self, data, value_input_option=None):
+            self.requests += 1
+
+    candidates = [
+        {'row': i + 2, 'phone': f"+7900{i:07d}", 'code': f"{i:06d}", 'vacancy': '', 'name': 'Кандидат'}
+        for i in range(count)
+    ]
+    sheet = FakeSheet()
+    client = FakeTwilioClient(latency)
+    cell_writer = SheetCellBatcher(sheet)
+
+    logging.getLogger().setLevel(logging.WARNING)
+    started = time.perf_counter()
+    success_count, fail_count = dispatch_invitations(candidates, cell_writer, client, workers, rate, burst=workers)
+    cell_writer.flush()
+    elapsed = time.perf_counter() - started
+
+    print(f"Отправлено {success_count} из {count} за {elapsed:.1f} с ({success_count / elapsed:.0f} SMS/с)")
+    print(f"Запросов к таблице: {sheet.requests}")
+    print(f"Последовательно с паузой 1 с заняло бы около {count * (1 + latency):.0f} с")
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--bench":
+        benchmark_dispatch(int(sys.argv[2]) if len(sys.argv) > 2 else 10000)
+        sys.exit()
     # Проверяем наличие необходимых переменных
     if not all([SID, AUTH_TOKEN, SYS_NUMBER]):
         logger.error("Не заданы переменные Twilio. Проверьте SID, AUTH_TOKEN и SYS_NUMBER.")
     elif not SITE_LINK:
         logger.error("Не задана ссылка на сайт. Проверьте SITE_LINK.")
     else:
-        main()
\ No newline at end of file
+        main(rescan="--rescan" in sys.argv)
\ No newline at end of file
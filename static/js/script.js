@@ -32,10 +32,34 @@ document.addEventListener('DOMContentLoaded', function() {
     let visualizationInterval;
     let accessCode = '';
     
+    // Потоковый режим: вопрос озвучивается по предложениям по мере генерации
+    const STREAM_MESSAGES = true;
+    // Повторные запросы вопроса, если генерация не удалась
+    const MESSAGE_RETRIES = 3;
+    const MESSAGE_RETRY_DELAY_MS = 2000;
+    
+    // Автоматическое окончание ответа по паузе в речи (определение голосовой активности)
+    const VAD_ENABLED = true;
+    const VAD_INTERVAL_MS = 50;        // период измерения уровня сигнала
+    const VAD_CALIBRATION_MS = 300;    // оценка уровня шума в начале записи
+    const VAD_MIN_SPEECH_MS = 150;     // короче - щелчок или стук, а не речь
+    const VAD_SILENCE_MS = 1500;       // пауза после речи, завершающая ответ
+    const VAD_NO_SPEECH_MS = 15000;    // сколько ждать начала ответа
+    const VAD_MAX_ANSWER_MS = 180000;  // предельная длительность ответа
+    const VAD_MIN_LEVEL = 0.01;        // границы порога речи (RMS)
+    const VAD_MAX_LEVEL = 0.05;
+    const VAD_PAD_MS = 300;            // запас вокруг речи при обрезке записи
+    
+    // Потоковая отправка ответа частями во время речи, сервер распознает его по фразам
+    const STREAM_UPLOAD = true;
+    const STREAM_CHUNK_MS = 250;
+    const STREAM_SAMPLE_RATE = 16000;
+    
     // Переменные для записи WAV
     let mediaRecorder;
     let audioChunks = [];
     let isRecording = false;
+    let stopStreamingResponse = null;
     
     // 1. Проверка кода доступа
     submitCodeBtn.addEventListener('click', checkAccessCode);
@@ -137,10 +161,11 @@ document.addEventListener('DOMContentLoaded', function() {
     }
     
     // 3. Функция начала записи WAV
-    function startRecording(stream, duration) {
+    function startRecording(stream, duration, useVad) {
         return new Promise((resolve) => {
             audioChunks = [];
             isRecording = true;
+            let vad = null;
             
             // Создаем MediaRecorder с настройками для WAV
             const options = {
@@ -160,8 +185,15 @@ document.addEventListener('DOMContentLoaded', function() {
             mediaRecorder.onstop = () => {
                 const audioBlob = new Blob(audioChunks, { type: 'audio/webm' });
                 
+                // Границы речи, найденные VAD, позволяют не отправлять тишину
+                let speechBounds = null;
+                if (vad) {
+                    vad.stop();
+                    speechBounds = vad.bounds();
+                }
+                
                 // Конвертируем webm в WAV
-                convertWebmToWav(audioBlob).then(wavBlob => {
+                convertWebmToWav(audioBlob, speechBounds).then(wavBlob => {
                     const reader = new FileReader();
                     reader.onload = () => {
                         resolve(reader.result);
@@ -173,6 +205,15 @@ document.addEventListener('DOMContentLoaded', function() {
             // Начинаем запись
             mediaRecorder.start();
             
+            // Останавливаем после паузы в речи
+            if (useVad) {
+                vad = startVoiceActivityDetection(stream, () => {
+                    if (isRecording) {
+                        stopRecording();
+                    }
+                });
+            }
+            
             // Останавливаем через указанное время
             if (duration) {
                 setTimeout(() => {
@@ -184,6 +225,76 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
     
+    // 3.1. Определение окончания ответа по энергии сигнала
+    function startVoiceActivityDetection(stream, onSpeechEnd) {
+        const vadContext = new (window.AudioContext || window.webkitAudioContext)();
+        const vadAnalyser = vadContext.createAnalyser();
+        vadAnalyser.fftSize = 2048;
+        vadContext.createMediaStreamSource(stream).connect(vadAnalyser);
+        const samples = new Float32Array(vadAnalyser.fftSize);
+        
+        const startedAt = performance.now();
+        let noiseLevel = 0;
+        let calibrationFrames = 0;
+        let speechStart = null;
+        let lastSpeech = null;
+        let voicedMs = 0;
+        let stopped = false;
+        
+        const timer = setInterval(() => {
+            vadAnalyser.getFloatTimeDomainData(samples);
+            let sum = 0;
+            for (let i = 0; i < samples.length; i++) {
+                sum += samples[i] * samples[i];
+            }
+            const level = Math.sqrt(sum / samples.length);
+            const elapsed = performance.now() - startedAt;
+            
+            // Первые миллисекунды записи - уровень фонового шума
+            if (elapsed < VAD_CALIBRATION_MS) {
+                noiseLevel = (noiseLevel * calibrationFrames + level) / (calibrationFrames + 1);
+                calibrationFrames++;
+                return;
+            }
+            
+            const threshold = Math.min(Math.max(noiseLevel * 3, VAD_MIN_LEVEL), VAD_MAX_LEVEL);
+            if (level >= threshold) {
+                if (speechStart === null) {
+                    speechStart = elapsed;
+                }
+                lastSpeech = elapsed;
+                voicedMs += VAD_INTERVAL_MS;
+            } else if (voicedMs < VAD_MIN_SPEECH_MS && lastSpeech !== null && elapsed - lastSpeech > VAD_SILENCE_MS) {
+                // Короткий всплеск без продолжения не считаем началом ответа
+                speechStart = null;
+                lastSpeech = null;
+                voicedMs = 0;
+            }
+            
+            const speaking = voicedMs >= VAD_MIN_SPEECH_MS;
+            const pauseAfterSpeech = speaking && elapsed - lastSpeech >= VAD_SILENCE_MS;
+            const noSpeech = !speaking && elapsed >= VAD_NO_SPEECH_MS;
+            if (pauseAfterSpeech || noSpeech || elapsed >= VAD_MAX_ANSWER_MS) {
+                stop();
+                onSpeechEnd();
+            }
+        }, VAD_INTERVAL_MS);
+        
+        function stop() {
+            if (stopped) return;
+            stopped = true;
+            clearInterval(timer);
+            vadContext.close();
+        }
+        
+        function bounds() {
+            if (voicedMs < VAD_MIN_SPEECH_MS) return null;
+            return { start: speechStart / 1000, end: lastSpeech / 1000 };
+        }
+        
+        return { stop, bounds };
+    }
+    
     // 4. Функция остановки записи
     function stopRecording() {
         if (isRecording && mediaRecorder && mediaRecorder.state === 'recording') {
@@ -198,20 +309,33 @@ document.addEventListener('DOMContentLoaded', function() {
     }
     
     // 5. Конвертация WebM в WAV
-    async function convertWebmToWav(webmBlob) {
+    async function convertWebmToWav(webmBlob, speechBounds) {
         const audioContext = new (window.AudioContext || window.webkitAudioContext)();
         const arrayBuffer = await webmBlob.arrayBuffer();
         const audioBuffer = await audioContext.decodeAudioData(arrayBuffer);
         
+        // Оставляем только речь с небольшим запасом по краям
+        let startSample = 0;
+        let endSample = audioBuffer.length;
+        if (speechBounds) {
+            const pad = VAD_PAD_MS / 1000;
+            startSample = Math.max(0, Math.floor((speechBounds.start - pad) * audioBuffer.sampleRate));
+            endSample = Math.min(audioBuffer.length, Math.ceil((speechBounds.end + pad) * audioBuffer.sampleRate));
+            if (endSample <= startSample) {
+                startSample = 0;
+                endSample = audioBuffer.length;
+            }
+        }
+        
         // Создаем WAV из аудиобуфера
-        const wavBuffer = audioBufferToWav(audioBuffer);
+        const wavBuffer = audioBufferToWav(audioBuffer, startSample, endSample);
         return new Blob([wavBuffer], { type: 'audio/wav' });
     }
     
     // 6. Преобразование AudioBuffer в WAV
-    function audioBufferToWav(buffer) {
+    function audioBufferToWav(buffer, startSample = 0, endSample = buffer.length) {
         const numOfChannels = buffer.numberOfChannels;
-        const length = buffer.length * numOfChannels * 2; // 2 байта на семпл (16 бит)
+        const length = (endSample - startSample) * numOfChannels * 2; // 2 байта на семпл (16 бит)
         const sampleRate = buffer.sampleRate;
         
         // Создаем буфер для WAV
@@ -235,7 +359,7 @@ document.addEventListener('DOMContentLoaded', function() {
         
         // Записываем аудиоданные
         let offset = 44;
-        for (let i = 0; i < buffer.length; i++) {
+        for (let i = startSample; i < endSample; i++) {
             for (let channel = 0; channel < numOfChannels; channel++) {
                 const sample = Math.max(-1, Math.min(1, buffer.getChannelData(channel)[i]));
                 view.setInt16(offset, sample < 0 ? sample * 0x8000 : sample * 0x7FFF, true);
@@ -270,17 +394,43 @@ document.addEventListener('DOMContentLoaded', function() {
         startRecordingBtn.style.display = 'none';
 
         while (true) {
-            const response = await fetch('/get_message');
-            const data = await response.json();
+            let data;
+            if (STREAM_MESSAGES) {
+                data = await playStreamedMessage();
+                for (let attempt = 1; data.error && attempt <= MESSAGE_RETRIES; attempt++) {
+                    await new Promise(resolve => setTimeout(resolve, MESSAGE_RETRY_DELAY_MS));
+                    data = await playStreamedMessage();
+                }
+            } else {
+                const response = await fetch('/get_message');
+                data = await response.json();
+                if (data.has_message) {
+                    await playMessage(data.audio_url);
+                }
+            }
             
+            if (data.error) {
+                // Собеседование не закончено: кнопка позволяет запросить вопрос ещё раз
+                startRecordingBtn.textContent = 'Не удалось получить вопрос. Повторить';
+                startRecordingBtn.style.display = '';
+                startRecordingBtn.classList.remove('hidden');
+                break;
+            }
             if (!data.has_message) {
                 showCompletion();
                 break;
             }
             
-            await playMessage(data.audio_url);
-            const audioData = await recordResponse();
-            await saveResponse(audioData);
+            // Если ответ не распознан, кандидат записывает его заново
+            let saved = false;
+            while (!saved) {
+                if (STREAM_UPLOAD) {
+                    saved = await streamResponse();
+                } else {
+                    const audioData = await recordResponse();
+                    saved = await saveResponse(audioData);
+                }
+            }
         }
     }
     
@@ -299,11 +449,57 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
     
+    // 10a. Потоковое получение вопроса: фрагменты играются по мере поступления
+    async function playStreamedMessage() {
+        let response;
+        try {
+            response = await fetch('/get_message_stream');
+        } catch (error) {
+            console.error('Ошибка:', error);
+            return { has_message: false, error: true };
+        }
+        if (!response.ok) {
+            return { has_message: false, error: true };
+        }
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let result = { has_message: false };
+        let playback = Promise.resolve();
+        
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            
+            buffer += decoder.decode(value, { stream: true });
+            const lines = buffer.split('\n');
+            buffer = lines.pop();
+            
+            for (const line of lines) {
+                if (!line.trim()) continue;
+                const data = JSON.parse(line);
+                
+                if (data.audio_url) {
+                    // Ставим фрагмент в очередь воспроизведения
+                    playback = playback.then(() => playMessage(data.audio_url));
+                }
+                if (data.done) {
+                    result = data;
+                }
+            }
+        }
+        
+        await playback;
+        return result;
+    }
+    
     // 11. Запись ответа
     function recordResponse() {
         return new Promise((resolve) => {
             recordingControls.classList.remove('hidden');
-            recordingStatus.textContent = "Идет запись ответа...";
+            recordingStatus.textContent = VAD_ENABLED
+                ? "Идет запись ответа... Запись остановится после паузы"
+                : "Идет запись ответа...";
             
             navigator.mediaDevices.getUserMedia({ 
                 audio: {
@@ -317,7 +513,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 startVisualization(stream, recordingVisualizer);
                 
                 // Записываем аудио
-                startRecording(stream).then(wavData => {
+                startRecording(stream, VAD_ENABLED ? VAD_MAX_ANSWER_MS : null, VAD_ENABLED).then(wavData => {
                     stopVisualization();
                     resolve(wavData);
                 });
@@ -329,8 +525,134 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
     
+    // 11.1. Потоковая запись ответа: звук уходит на сервер частями, пока кандидат говорит
+    function streamResponse() {
+        return new Promise((resolve) => {
+            recordingControls.classList.remove('hidden');
+            recordingStatus.textContent = VAD_ENABLED
+                ? "Идет запись ответа... Запись остановится после паузы"
+                : "Идет запись ответа...";
+            
+            navigator.mediaDevices.getUserMedia({ 
+                audio: {
+                    channelCount: 1,
+                    echoCancellation: true,
+                    noiseSuppression: true
+                }
+            })
+            .then(stream => {
+                startVisualization(stream, recordingVisualizer);
+                
+                const streamContext = new (window.AudioContext || window.webkitAudioContext)();
+                const source = streamContext.createMediaStreamSource(stream);
+                const processor = streamContext.createScriptProcessor(4096, 1, 1);
+                const chunkLength = streamContext.sampleRate * STREAM_CHUNK_MS / 1000;
+                let pending = [];
+                let pendingLength = 0;
+                let seq = 0;
+                let uploads = Promise.resolve();
+                let finished = false;
+                
+                // Части отправляются строго по очереди, сервер проверяет их номера
+                function sendChunk(force) {
+                    if (!pendingLength && !force) return;
+                    const chunk = downsampleToInt16(pending, pendingLength, streamContext.sampleRate);
+                    pending = [];
+                    pendingLength = 0;
+                    const chunkSeq = seq++;
+                    uploads = uploads.then(() => fetch(`/stream_response/chunk?seq=${chunkSeq}`, {
+                        method: 'POST',
+                        headers: { 'Content-Type': 'application/octet-stream' },
+                        body: chunk
+                    })).then(response => {
+                        if (!response.ok) {
+                            throw new Error('Ошибка отправки записи');
+                        }
+                    });
+                }
+                
+                processor.onaudioprocess = (event) => {
+                    if (finished) return;
+                    pending.push(new Float32Array(event.inputBuffer.getChannelData(0)));
+                    pendingLength += event.inputBuffer.length;
+                    if (pendingLength >= chunkLength) {
+                        sendChunk(false);
+                    }
+                };
+                source.connect(processor);
+                processor.connect(streamContext.destination);
+                
+                const vad = VAD_ENABLED ? startVoiceActivityDetection(stream, finish) : null;
+                stopStreamingResponse = finish;
+                
+                function finish() {
+                    if (finished) return;
+                    finished = true;
+                    stopStreamingResponse = null;
+                    if (vad) {
+                        vad.stop();
+                    }
+                    sendChunk(seq === 0);
+                    processor.disconnect();
+                    source.disconnect();
+                    streamContext.close();
+                    stream.getTracks().forEach(track => track.stop());
+                    stopVisualization();
+                    recordingStatus.textContent = "Сохранение записи...";
+                    
+                    uploads
+                        .then(() => fetch('/stream_response/finish', { method: 'POST' }))
+                        .then(response => {
+                            if (!response.ok) {
+                                throw new Error('Ошибка сети');
+                            }
+                            return response.json();
+                        })
+                        .then(data => showSaveResult(data))
+                        .then(resolve)
+                        .catch(error => {
+                            console.error('Ошибка:', error);
+                            recordingResult.textContent = 'Ошибка сохранения: ' + error.message;
+                            recordingResult.className = 'error';
+                        });
+                }
+            })
+            .catch(err => {
+                console.error('Ошибка доступа к микрофону:', err);
+                recordingStatus.textContent = "Ошибка доступа к микрофону";
+            });
+        });
+    }
+    
+    // 11.2. Перевод записи в 16-битный звук с частотой STREAM_SAMPLE_RATE
+    function downsampleToInt16(buffers, length, inputRate) {
+        const merged = new Float32Array(length);
+        let offset = 0;
+        for (const buffer of buffers) {
+            merged.set(buffer, offset);
+            offset += buffer.length;
+        }
+        
+        const ratio = inputRate / STREAM_SAMPLE_RATE;
+        const result = new Int16Array(Math.floor(length / ratio));
+        for (let i = 0; i < result.length; i++) {
+            const start = Math.floor(i * ratio);
+            const end = Math.max(start + 1, Math.min(length, Math.floor((i + 1) * ratio)));
+            let sum = 0;
+            for (let j = start; j < end; j++) {
+                sum += merged[j];
+            }
+            const sample = Math.max(-1, Math.min(1, sum / (end - start)));
+            result[i] = sample < 0 ? sample * 0x8000 : sample * 0x7FFF;
+        }
+        return result;
+    }
+    
     // 12. Остановка записи
     stopRecordingBtn.addEventListener('click', () => {
+        if (stopStreamingResponse) {
+            stopStreamingResponse();
+        }
         stopRecording();
         recordingStatus.textContent = "Сохранение записи...";
     });
@@ -360,21 +682,8 @@ document.addEventListener('DOMContentLoaded', function() {
                 }
                 return response.json();
             })
-            .then(data => {
-                if (data.status === 'success') {
-                    recordingResult.textContent = 'Ответ сохранен';
-                    recordingResult.className = 'success';
-                    
-                    setTimeout(() => {
-                        recordingControls.classList.add('hidden');
-                        recordingResult.textContent = '';
-                        recordingResult.className = '';
-                        resolve();
-                    }, 1000);
-                } else {
-                    throw new Error(data.message);
-                }
-            })
+            .then(data => showSaveResult(data))
+            .then(resolve)
             .catch(error => {
                 console.error('Ошибка:', error);
                 recordingResult.textContent = 'Ошибка сохранения: ' + error.message;
@@ -383,6 +692,31 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
     
+    // 13.1. Сообщение о сохранении ответа; false - ответ нужно записать заново
+    function showSaveResult(data) {
+        return new Promise((resolve) => {
+            if (data.status === 'retry') {
+                recordingResult.textContent = data.message;
+                recordingResult.className = 'error';
+                resolve(false);
+                return;
+            }
+            if (data.status !== 'success') {
+                throw new Error(data.message);
+            }
+            
+            recordingResult.textContent = 'Ответ сохранен';
+            recordingResult.className = 'success';
+            
+            setTimeout(() => {
+                recordingControls.classList.add('hidden');
+                recordingResult.textContent = '';
+                recordingResult.className = '';
+                resolve(true);
+            }, 1000);
+        });
+    }
+    
     // 14. Завершение разговора
     function showCompletion() {
         recordingSection.classList.add('hidden');
@@ -0,0 +1,190 @@
+import io
+import time
+import wave
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from vad import frame_levels, FRAME_MS
+
+logger = logging.getLogger(__name__)
+
+# Формат звука, который браузер присылает частями: 16 кГц, моно, 16 бит
+STREAM_SAMPLE_RATE = 16000
+STREAM_SAMPLE_WIDTH = 2
+# Уровень речи (RMS, доля полной шкалы); шум в браузере уже подавлен
+SPEECH_LEVEL = 0.02
+# Пауза, после которой фраза отправляется на распознавание (мс)
+SEGMENT_PAUSE_MS = 600
+# Фразы короче считаются шумом, длиннее режутся принудительно (мс)
+MIN_SEGMENT_MS = 150
+MAX_SEGMENT_MS = 15000
+# Тишина, оставляемая перед фразой (мс)
+SEGMENT_PAD_MS = 200
+# Предельная длительность потокового ответа (с)
+MAX_STREAM_SECONDS = 300
+
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="streaming_stt")
+
+
+class StreamingTranscriber:
+    """
+    Распознавание ответа, приходящего частями, пока кандидат говорит.
+    Звук режется на фразы по паузам; законченная фраза распознаётся в фоне,
+    и к концу ответа остаётся распознать только последнюю фразу.
+    recognize(pcm, sample_rate, sample_width) возвращает текст фразы.
+    """
+
+    def __init__(self, recognize, sample_rate=STREAM_SAMPLE_RATE, sample_width=STREAM_SAMPLE_WIDTH,
+                 executor=None):
+        self.recognize = recognize
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.executor = executor or _executor
+        self.next_seq = 0
+        self.updated_at = time.time()
+        self._bytes_per_ms = sample_rate * sample_width / 1000
+        self._frame_bytes = sample_width * (sample_rate * FRAME_MS // 1000)
+        self._audio = bytearray()
+        self._scanned = 0
+        self._segment_start = 0
+        self._voiced_frames = 0
+        self._silent_frames = 0
+        self._futures = []
+        self._lock = threading.Lock()
+
+    @property
+    def duration(self):
+        return len(self._audio) / self._bytes_per_ms / 1000
+
+    def accept(self, seq, chunk):
+        """Добавляет часть звука; части должны приходить по порядку номеров"""
+        with self._lock:
+            if seq != self.next_seq:
+                raise ValueError(f"Ожидалась часть {self.next_seq}, получена {seq}")
+            if self.duration + len(chunk) / self._bytes_per_ms / 1000 > MAX_STREAM_SECONDS:
+                raise ValueError("Превышена длительность ответа")
+            self.next_seq += 1
+            self.updated_at = time.time()
+            self._audio.extend(chunk)
+            self._scan()
+
+    def finish(self):
+        """Распознаёт остаток и возвращает текст всего ответа"""
+        with self._lock:
+            self._cut(len(self._audio))
+            futures = list(self._futures)
+
+        texts = []
+        for future in futures:
+            try:
+                text = future.result()
+            except Exception as e:
+                logger.error(f"Ошибка распознавания фразы: {e}")
+                continue
+            if text:
+                texts.append(text.strip())
+        return " ".join(texts)
+
+    def wav_bytes(self):
+        """Весь ответ в виде WAV для сохранения"""
+        buffer = io.BytesIO()
+        with wave.open(buffer, 'wb') as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(self.sample_width)
+            wav.setframerate(self.sample_rate)
+            with self._lock:
+                wav.writeframes(bytes(self._audio))
+        return buffer.getvalue()
+
+    def _scan(self):
+        frames = (len(self._audio) - self._scanned) // self._frame_bytes
+        if frames == 0:
+            return
+        end = self._scanned + frames * self._frame_bytes
+        levels = frame_levels(bytes(self._audio[self._scanned:end]), self.sample_width, self._frame_bytes)
+
+        pad_bytes = int(SEGMENT_PAD_MS * self._bytes_per_ms) // self.sample_width * self.sample_width
+        for level in levels:
+            self._scanned += self._frame_bytes
+            if level >= SPEECH_LEVEL:
+                self._voiced_frames += 1
+                self._silent_frames = 0
+            else:
+                self._silent_frames += 1
+
+            if self._voiced_frames * FRAME_MS < MIN_SEGMENT_MS:
+                if self._silent_frames * FRAME_MS >= SEGMENT_PAUSE_MS:
+                    # Тишина или одиночный щелчок: фразы ещё нет, держим только запас перед ней
+                    self._voiced_frames = 0
+                    self._segment_start = max(self._segment_start, self._scanned - pad_bytes)
+                continue
+
+            segment_ms = (self._scanned - self._segment_start) / self._bytes_per_ms
+            if self._silent_frames * FRAME_MS >= SEGMENT_PAUSE_MS or segment_ms >= MAX_SEGMENT_MS:
+                self._cut(self._scanned)
+
+    def _cut(self, end):
+        if self._voiced_frames * FRAME_MS >= MIN_SEGMENT_MS:
+            pcm = bytes(self._audio[self._segment_start:end])
+            self._futures.append(
+                self.executor.submit(self.recognize, pcm, self.sample_rate, self.sample_width)
+            )
+        self._segment_start = end
+        self._voiced_frames = 0
+        self._silent_frames = 0
+
+
+class OfflineStandInRecognizer:
+    """
+    Локальная замена распознавателя для проверки и замеров без сети:
+    тратит на фразу rtf от её длительности и возвращает её описание.
+    """
+
+    def __init__(self, rtf=0.3):
+        self.rtf = rtf
+
+    def __call__(self, pcm, sample_rate, sample_width):
+        duration = len(pcm) / (sample_rate * sample_width)
+        time.sleep(duration * self.rtf)
+        return f"[фраза {duration:.1f} с]"
+
+
+def _synthetic_answer(phrases=6, phrase_seconds=3.0, pause_seconds=0.8, sample_rate=STREAM_SAMPLE_RATE):
+    """Ответ из фраз-тонов, разделённых паузами, в формате потоковой записи"""
+    import math
+    from array import array
+
+    samples = array('h')
+    for _ in range(phrases):
+        for i in range(int(phrase_seconds * sample_rate)):
+            samples.append(int(6000 * math.sin(2 * math.pi * 220 * i / sample_rate)))
+        samples.extend([0] * int(pause_seconds * sample_rate))
+    return samples.tobytes()
+
+
+def _benchmark(rtf=0.3, chunk_ms=250):
+    """Задержка от конца ответа до текста: весь файл после записи против потокового распознавания"""
+    recognize = OfflineStandInRecognizer(rtf)
+    audio = _synthetic_answer()
+    chunk_bytes = int(STREAM_SAMPLE_RATE * STREAM_SAMPLE_WIDTH * chunk_ms / 1000)
+
+    started = time.perf_counter()
+    recognize(audio, STREAM_SAMPLE_RATE, STREAM_SAMPLE_WIDTH)
+    whole = time.perf_counter() - started
+
+    transcriber = StreamingTranscriber(recognize)
+    for seq, offset in enumerate(range(0, len(audio), chunk_bytes)):
+        transcriber.accept(seq, audio[offset:offset + chunk_bytes])
+        # Части приходят в реальном времени
+        time.sleep(chunk_ms / 1000)
+    started = time.perf_counter()
+    text = transcriber.finish()
+    streamed = time.perf_counter() - started
+
+    print(f"Ответ {transcriber.duration:.1f} с, RTF распознавателя {rtf}")
+    print(f"Весь файл после записи: текст через {whole:.2f} с")
+    print(f"Потоковое распознавание: текст через {streamed:.2f} с ({text})")
+
+
+if __name__ == "__main__":
+    _benchmark()
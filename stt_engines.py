@@ -0,0 +1,267 @@
+import os
+import json
+import time
+import wave
+import threading
+import logging
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from vad import audioop
+from streaming_stt import OfflineStandInRecognizer
+
+logger = logging.getLogger(__name__)
+
+STT_LANGUAGE = "ru"
+
+
+def to_mono16(pcm, sample_width, channels):
+    """Приводит PCM к 16 битам и одному каналу"""
+    if sample_width == 2 and channels == 1:
+        return pcm
+    if audioop is not None:
+        if sample_width != 2:
+            pcm = audioop.lin2lin(pcm, sample_width, 2)
+        if channels == 2:
+            pcm = audioop.tomono(pcm, 2, 0.5, 0.5)
+        return pcm
+
+    # Без audioop поддерживается только 16-битный звук
+    if sample_width != 2 or channels > 2:
+        raise ValueError(f"Формат {sample_width * 8} бит, {channels} каналов не поддерживается")
+    samples = array('h')
+    samples.frombytes(pcm[:len(pcm) - len(pcm) % 4])
+    mono = array('h', ((samples[i] + samples[i + 1]) // 2 for i in range(0, len(samples), 2)))
+    return mono.tobytes()
+
+
+class SpeechEngine:
+    """
+    Движок распознавания речи. load() вызывается один раз при старте,
+    transcribe() получает 16-битный моно PCM. concurrent - можно ли вызывать
+    transcribe() из нескольких потоков одновременно.
+    """
+
+    name = "base"
+    concurrent = True
+
+    def load(self):
+        pass
+
+    def transcribe(self, pcm, sample_rate):
+        raise NotImplementedError
+
+
+class VoskEngine(SpeechEngine):
+    """Vosk (Kaldi): модель общая для всех потоков, распознаватель создаётся на каждый вызов"""
+
+    name = "vosk"
+
+    def __init__(self, model_path):
+        self.model_path = model_path
+        self.model = None
+
+    def load(self):
+        if not os.path.isdir(self.model_path or ""):
+            raise FileNotFoundError(f"Модель Vosk не найдена: {self.model_path}")
+        from vosk import Model, SetLogLevel
+        SetLogLevel(-1)
+        self.model = Model(self.model_path)
+
+    def transcribe(self, pcm, sample_rate):
+        from vosk import KaldiRecognizer
+        recognizer = KaldiRecognizer(self.model, sample_rate)
+        texts = []
+        # Подаём звук частями по 0.25 с, как при потоковой записи
+        step = sample_rate // 2
+        for offset in range(0, len(pcm), step):
+            if recognizer.AcceptWaveform(pcm[offset:offset + step]):
+                texts.append(json.loads(recognizer.Result()).get("text", ""))
+        texts.append(json.loads(recognizer.FinalResult()).get("text", ""))
+        return " ".join(text for text in texts if text)
+
+
+class WhisperCppEngine(SpeechEngine):
+    """
+    whisper.cpp через pywhispercpp. Контекст модели не потокобезопасен,
+    поэтому вызовы идут по одному, а ядра процессора занимает сам whisper.cpp.
+    """
+
+    name = "whisper"
+    concurrent = False
+
+    def __init__(self, model_path, threads=None):
+        self.model_path = model_path
+        self.threads = threads or os.cpu_count() or 1
+        self.model = None
+
+    def load(self):
+        from pywhispercpp.model import Model
+        self.model = Model(self.model_path, n_threads=self.threads, print_progress=False, print_realtime=False)
+
+    def transcribe(self, pcm, sample_rate):
+        import numpy as np
+        audio = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+        if sample_rate != 16000:
+            positions = np.arange(0, len(audio), sample_rate / 16000)
+            audio = np.interp(positions, np.arange(len(audio)), audio).astype(np.float32)
+        segments = self.model.transcribe(audio, language=STT_LANGUAGE)
+        return " ".join(segment.text.strip() for segment in segments).strip()
+
+
+class GoogleEngine(SpeechEngine):
+    """Google Web Speech API через speech_recognition - сетевой запрос на каждую фразу"""
+
+    name = "google"
+
+    def load(self):
+        import speech_recognition as sr
+        self._sr = sr
+        self.recognizer = sr.Recognizer()
+
+    def transcribe(self, pcm, sample_rate):
+        try:
+            return self.recognizer.recognize_google(
+                self._sr.AudioData(pcm, sample_rate, 2), language=f"{STT_LANGUAGE}-RU"
+            )
+        except self._sr.UnknownValueError:
+            return ""
+
+
+class StandInEngine(SpeechEngine):
+    """Локальная замена без модели и сети для проверки и замеров"""
+
+    name = "standin"
+
+    def __init__(self, rtf=0.3):
+        self.recognize = OfflineStandInRecognizer(rtf)
+
+    def transcribe(self, pcm, sample_rate):
+        return self.recognize(pcm, sample_rate, 2)
+
+
+ENGINES = {
+    "vosk": VoskEngine,
+    "whisper": WhisperCppEngine,
+    "google": GoogleEngine,
+    "standin": StandInEngine,
+}
+
+
+def create_engine(name, model_path=None):
+    engine_class = ENGINES.get(name)
+    if engine_class is None:
+        raise ValueError(f"Неизвестный движок распознавания: {name}")
+    if engine_class in (VoskEngine, WhisperCppEngine):
+        return engine_class(model_path)
+    return engine_class()
+
+
+class SpeechService:
+    """
+    Загруженный движок распознавания и пул потоков для него.
+    Для потокобезопасных движков пул по числу ядер, иначе один поток.
+    Считает коэффициент реального времени (время распознавания / длительность звука).
+    """
+
+    def __init__(self, engine, workers=None):
+        self.engine = engine
+        started = time.perf_counter()
+        engine.load()
+        self.load_seconds = time.perf_counter() - started
+        if engine.concurrent:
+            self.workers = workers or os.cpu_count() or 1
+        else:
+            self.workers = 1
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"stt_{engine.name}")
+        self._calls = 0
+        self._audio_seconds = 0.0
+        self._busy_seconds = 0.0
+        self._lock = threading.Lock()
+        logger.info(f"Движок распознавания {engine.name} загружен за {self.load_seconds:.1f} с, потоков: {self.workers}")
+
+    def run(self, pcm, sample_rate, sample_width=2, channels=1):
+        """Распознаёт звук в текущем потоке (для кода, который уже работает в пуле executor)"""
+        pcm = to_mono16(pcm, sample_width, channels)
+        started = time.perf_counter()
+        text = self.engine.transcribe(pcm, sample_rate)
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._calls += 1
+            self._audio_seconds += len(pcm) / (2 * sample_rate)
+            self._busy_seconds += elapsed
+        return text
+
+    def transcribe(self, pcm, sample_rate, sample_width=2, channels=1):
+        """Распознаёт звук в пуле потоков движка"""
+        return self.executor.submit(self.run, pcm, sample_rate, sample_width, channels).result()
+
+    def transcribe_file(self, path):
+        """Распознаёт WAV-файл"""
+        with wave.open(path, 'rb') as wav:
+            params = wav.getparams()
+            pcm = wav.readframes(params.nframes)
+        return self.transcribe(pcm, params.framerate, params.sampwidth, params.nchannels)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "engine": self.engine.name,
+                "workers": self.workers,
+                "load_seconds": round(self.load_seconds, 2),
+                "calls": self._calls,
+                "audio_seconds": round(self._audio_seconds, 1),
+                "rtf": round(self._busy_seconds / self._audio_seconds, 3) if self._audio_seconds else None,
+            }
+
+
+def load_speech_service(name, model_path=None, fallback=None):
+    """
+    Загружает движок. Если модель недоступна, используется запасной движок,
+    только когда он явно задан; иначе ошибка загрузки останавливает запуск.
+    """
+    try:
+        return SpeechService(create_engine(name, model_path))
+    except Exception as e:
+        if not fallback or fallback == name:
+            raise RuntimeError(
+                f"Не удалось загрузить движок распознавания {name}: {e}. Установите пакет движка и укажите "
+                f"модель в STT_MODEL_PATH, выберите другой движок в STT_ENGINE или задайте STT_FALLBACK_ENGINE"
+            ) from e
+        logger.error(f"Не удалось загрузить движок распознавания {name}: {e}. Используется {fallback}")
+        return SpeechService(create_engine(fallback))
+
+
+def benchmark(paths, specs):
+    """Коэффициент реального времени движков на WAV-файлах; spec - имя или имя:путь_к_модели"""
+    for spec in specs:
+        name, _, model_path = spec.partition(":")
+        try:
+            service = SpeechService(create_engine(name, model_path or None))
+        except Exception as e:
+            print(f"{name}: не загружен ({e})")
+            continue
+        try:
+            for path in paths:
+                service.transcribe_file(path)
+        except Exception as e:
+            print(f"{name}: ошибка распознавания ({e})")
+            service.executor.shutdown()
+            continue
+        stats = service.stats()
+        print(f"{name}: загрузка {stats['load_seconds']} с, {stats['audio_seconds']} с звука, RTF {stats['rtf']}")
+        service.executor.shutdown()
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 2:
+        print("Использование: python stt_engines.py файл.wav [...] [--engines vosk:путь whisper:путь standin]")
+        sys.exit(1)
+    args = sys.argv[1:]
+    if "--engines" in args:
+        index = args.index("--engines")
+        files, engines = args[:index], args[index + 1:]
+    else:
+        files, engines = args, ["standin"]
+    benchmark(files, engines)
@@ -0,0 +1,126 @@
+import hashlib
+import os
+import threading
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class TTSCache:
+    """
+    Кеш синтезированной речи с адресацией по содержимому.
+    Ключ - хеш (текст, голос, язык, формат, частота). Два уровня: горячие записи
+    в памяти (LRU по количеству) и файлы на диске (LRU по суммарному размеру).
+    """
+
+    def __init__(self, root, max_bytes=256 * 1024 * 1024, memory_items=64):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+        self._disk_bytes = sum(
+            os.path.getsize(os.path.join(self.root, name)) for name in os.listdir(self.root)
+        )
+
+    @staticmethod
+    def make_key(text, voice, lang, audio_format, sample_rate):
+        raw = "\x1f".join([text, voice, lang, audio_format, str(sample_rate)])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Возвращает аудио по ключу или None"""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return data
+
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        # Обновляем время доступа для LRU на диске; ошибка не мешает отдать прочитанное
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        with self._lock:
+            self.disk_hits += 1
+            self._remember(key, data)
+        return data
+
+    def put(self, key, data):
+        """Сохраняет аудио в кеш"""
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+
+        with self._lock:
+            # Повторная запись той же фразы заменяет файл, а не добавляет объём
+            try:
+                old_size = os.path.getsize(path)
+            except OSError:
+                old_size = 0
+            os.replace(tmp_path, path)
+            self._remember(key, data)
+            self._disk_bytes += len(data) - old_size
+            if self._disk_bytes > self.max_bytes:
+                self._evict()
+
+    def stats(self):
+        """Счётчики попаданий и промахов"""
+        with self._lock:
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "memory_items": len(self._memory),
+                "disk_bytes": self._disk_bytes,
+            }
+
+    def _remember(self, key, data):
+        self._memory[key] = data
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _evict(self):
+        # Удаляем давно не использованные файлы, пока не уложимся в лимит
+        files = []
+        for name in os.listdir(self.root):
+            if name.endswith(".tmp"):
+                continue
+            path = os.path.join(self.root, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, path))
+
+        self._disk_bytes = sum(size for _, size, _ in files)
+        files.sort()
+        for _, size, path in files:
+            if self._disk_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._disk_bytes -= size
+        logger.info(f"Кеш TTS очищен до {self._disk_bytes} байт")
+
+    def _path(self, key):
+        return os.path.join(self.root, key)
@@ -0,0 +1,230 @@
+import os
+import re
+import sys
+import time
+import logging
+from collections import defaultdict, namedtuple
+from prefilter import tokenize, words, STEM_LENGTH, MIN_TOKEN_LENGTH, STOP_WORDS
+
+logger = logging.getLogger(__name__)
+
+# Вес обязательного и желательного навыка в доле совпадения
+REQUIRED_WEIGHT = 2.0
+NICE_WEIGHT = 1.0
+
+# Заголовки разделов описания вакансии. Текст после заголовка относится к разделу
+# до следующего заголовка. Слово считается заголовком, только если стоит в начале
+# строки или за ним идёт двоеточие: "задачи" посреди требования раздел не меняет
+REQUIRED_MARKERS = [
+    r"требования", r"обязательно", r"необходимо", r"мы ждем", r"ожидаем",
+    r"знание специальных программ", r"навыки работы на компьютере", r"знание иностранных языков",
+]
+NICE_MARKERS = [
+    r"будет (?:плюсом|преимуществом)", r"(?:плюсом|преимуществом) будет", r"желательно",
+    r"приветствуется", r"nice to have",
+]
+SKIP_MARKERS = [
+    r"обязанности", r"задачи", r"условия", r"мы предлагаем", r"доход", r"оклад", r"премия",
+    r"адрес", r"регион", r"город", r"график", r"уровень образования", r"требуемый опыт",
+    r"уровень владения языка", r"наличие командировок", r"дополнительная информация",
+]
+_MARKER_RE = re.compile(
+    r"\b(?:" + "|".join(
+        f"(?P<{section}>{'|'.join(markers)})"
+        for section, markers in (("required", REQUIRED_MARKERS), ("nice", NICE_MARKERS), ("skip", SKIP_MARKERS))
+    ).replace(" ", r"\s+") + r")\b",
+    re.IGNORECASE,
+)
+# После заголовка может идти пояснение в скобках: "Требования (для публикации):"
+_HEADING_END_RE = re.compile(r"\s*(?:\([^)\n]*\))?\s*:")
+_LINE_PREFIX_CHARS = " \t-*•—–"
+# Общие слова требований, которые не являются навыками: слова с этими началами,
+# частые прилагательные и качества кандидата
+GENERIC_PREFIXES = (
+    "опыт", "работ", "знан", "навык", "умен", "понима", "владе", "уверен", "участ", "предст",
+    "публик", "основн", "хорош", "лет", "год", "уровен", "требу", "налич", "област", "принцип",
+    "базов", "дополн", "информ", "примен", "провед", "подгот", "развит", "высш", "образов",
+    "сложн", "отличн", "высок", "активн", "больш", "различн", "современ", "успешн", "собствен",
+    "необходим", "ключев", "профильн", "релевант", "аналогичн", "глубок", "самостоятельн", "быстр",
+    "грамотн", "устн", "письменн", "ответствен", "аккуратн", "исполнитель", "инициатив",
+    "коммуникабельн", "стрессоустойчив", "внимательн", "обучаем", "пунктуальн", "желани",
+    "способн", "готовн", "стремлени", "широк", "крупн", "нов", "друг", "наш", "ваш", "задач",
+)
+SKILL_STOP_WORDS = {"также", "плюс", "под", "над", "др", "пр", "тп", "тд", "речь", "память"}
+# Окончания инфинитива: глаголы ("решать", "работать") навыками не считаются
+VERB_ENDINGS = ("ать", "ять", "ить", "еть", "уть", "ыть", "ться", "чь")
+
+VacancyProfile = namedtuple("VacancyProfile", ["vacancy_id", "title", "required", "nice", "terms"])
+VacancyMatch = namedtuple("VacancyMatch", ["vacancy_id", "title", "score", "matched", "missing"])
+
+
+def _skill_terms(text):
+    """Навыки фрагмента: основа -> слово, как оно написано в вакансии"""
+    terms = {}
+    for word in words(text):
+        if len(word) < MIN_TOKEN_LENGTH or word in STOP_WORDS or word in SKILL_STOP_WORDS or word.isdigit():
+            continue
+        if word.startswith(GENERIC_PREFIXES) or (len(word) >= 5 and word.endswith(VERB_ENDINGS)):
+            continue
+        terms.setdefault(word[:STEM_LENGTH], word)
+    return terms
+
+
+def _is_heading(text, marker):
+    """Заголовок раздела: в начале строки (после маркера списка) или перед двоеточием"""
+    line_start = text.rfind("\n", 0, marker.start()) + 1
+    if not text[line_start:marker.start()].strip(_LINE_PREFIX_CHARS):
+        return True
+    return _HEADING_END_RE.match(text, marker.end()) is not None
+
+
+def compile_vacancy(vacancy_id, title, text):
+    """
+    Разбирает описание вакансии один раз: обязательные и желательные навыки
+    в виде нормализованных основ слов. Если разделов требований нет,
+    обязательными считаются навыки всего текста.
+    """
+    text = text or ""
+    sections = {"required": {}, "nice": {}}
+    section, position = None, 0
+    for marker in _MARKER_RE.finditer(text):
+        if not _is_heading(text, marker):
+            continue
+        if section in sections:
+            sections[section].update(_skill_terms(text[position:marker.start()]))
+        section, position = marker.lastgroup, marker.end()
+    if section in sections:
+        sections[section].update(_skill_terms(text[position:]))
+    if not sections["required"] and not sections["nice"]:
+        sections["required"] = _skill_terms(text)
+
+    required = frozenset(sections["required"])
+    nice = frozenset(sections["nice"]) - required
+    terms = dict(sections["nice"], **sections["required"])
+    return VacancyProfile(vacancy_id, title, required, nice, terms)
+
+
+class VacancyIndex:
+    """
+    Требования открытых вакансий и обратный индекс навык -> вакансии.
+    Резюме сопоставляется со всеми вакансиями за один проход по его словам,
+    без запросов к LLM.
+    """
+
+    def __init__(self):
+        self.profiles = {}
+        self._postings = defaultdict(dict)
+        self._totals = {}
+
+    def add(self, vacancy_id, title, text):
+        self.remove(vacancy_id)
+        profile = compile_vacancy(vacancy_id, title, text)
+        self.profiles[vacancy_id] = profile
+        for term in profile.required:
+            self._postings[term][vacancy_id] = REQUIRED_WEIGHT
+        for term in profile.nice:
+            self._postings[term][vacancy_id] = NICE_WEIGHT
+        self._totals[vacancy_id] = REQUIRED_WEIGHT * len(profile.required) + NICE_WEIGHT * len(profile.nice)
+        return profile
+
+    def remove(self, vacancy_id):
+        profile = self.profiles.pop(vacancy_id, None)
+        if profile is None:
+            return
+        for term in profile.required | profile.nice:
+            postings = self._postings[term]
+            postings.pop(vacancy_id, None)
+            if not postings:
+                del self._postings[term]
+        del self._totals[vacancy_id]
+
+    def rebuild(self, vacancies):
+        """Индексирует все вакансии из словаря id -> {"title", "text"}"""
+        started = time.perf_counter()
+        self.profiles.clear()
+        self._postings.clear()
+        self._totals.clear()
+        for vacancy_id, vacancy in vacancies.items():
+            self.add(vacancy_id, vacancy["title"], vacancy["text"])
+        logger.info(
+            f"Индекс вакансий: {len(self.profiles)} вакансий, {len(self._postings)} навыков "
+            f"за {(time.perf_counter() - started) * 1000:.0f} мс"
+        )
+
+    def match(self, resume_text, limit=None):
+        """Вакансии по убыванию доли совпавших навыков (обязательные весят больше)"""
+        resume_terms = set(tokenize(resume_text))
+        weights = defaultdict(float)
+        for term in resume_terms:
+            for vacancy_id, weight in self._postings.get(term, {}).items():
+                weights[vacancy_id] += weight
+
+        matches = []
+        for vacancy_id, weight in weights.items():
+            profile = self.profiles[vacancy_id]
+            matches.append(VacancyMatch(
+                vacancy_id,
+                profile.title,
+                weight / self._totals[vacancy_id],
+                sorted(profile.terms[term] for term in (profile.required | profile.nice) & resume_terms),
+                sorted(profile.terms[term] for term in profile.required - resume_terms),
+            ))
+        matches.sort(key=lambda match: -match.score)
+        return matches[:limit] if limit else matches
+
+
+def _benchmark(vacancies=200, resumes=1000):
+    """Сопоставление резюме со всеми вакансиями по индексу"""
+    import random
+
+    rng = random.Random(1)
+    letters = "абвгдежзиклмнопрстуфхцчшэюя"
+    skills = list({"".join(rng.choice(letters) for _ in range(STEM_LENGTH)) for _ in range(3000)})
+    index = VacancyIndex()
+    index.rebuild({
+        str(i): {
+            "title": f"Вакансия {i}",
+            "text": "Требования: " + " ".join(rng.sample(skills, 15)) + " Будет плюсом: " + " ".join(rng.sample(skills, 10)),
+        }
+        for i in range(vacancies)
+    })
+    texts = [" ".join(rng.sample(skills, 200)) for _ in range(resumes)]
+
+    started = time.perf_counter()
+    for text in texts:
+        index.match(text, limit=3)
+    elapsed = time.perf_counter() - started
+    print(f"{resumes} резюме x {vacancies} вакансий: {elapsed:.2f} с, "
+          f"{elapsed / resumes * 1000:.2f} мс на резюме вместо {vacancies} вызовов LLM")
+
+
+def _check():
+    """Разбор вакансий: пример с "задачами" внутри требований и реальная вакансия из AI HR"""
+    from documents import extract_text
+
+    def skills(profile, terms):
+        return {profile.terms[term] for term in terms}
+
+    profile = compile_vacancy("example", "Пример", (
+        "Требования: опыт от 3 лет, умение решать сложные задачи с Docker и Kubernetes. "
+        "Будет плюсом: Go, Redis"
+    ))
+    required, nice = skills(profile, profile.required), skills(profile, profile.nice)
+    print(f"Пример: обязательные {sorted(required)}, желательные {sorted(nice)}")
+    assert {"docker", "kubernetes"} <= required, required
+    assert {"go", "redis"} <= nice, nice
+    assert not {"решать", "сложные", "задачи"} & (required | nice), required | nice
+
+    profile = compile_vacancy("it", "Ведущий инженер", extract_text(os.path.join("AI HR", "Описание ИТ.docx")))
+    required = skills(profile, profile.required)
+    print(f"Описание ИТ: обязательные {sorted(required)}")
+    assert {"san", "lan", "excel", "visio"} <= required, required
+    assert not {"ответственность", "работать", "грамотная"} & required, required
+    print("Проверка пройдена")
+
+
+if __name__ == "__main__":
+    if "--check" in sys.argv:
+        _check()
+    else:
+        _benchmark()
@@ -0,0 +1,118 @@
+import math
+import os
+import sys
+import wave
+import warnings
+import logging
+from array import array
+from operator import mul
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore", DeprecationWarning)
+    try:
+        import audioop
+    except ImportError:
+        # Модуль удалён из стандартной библиотеки в Python 3.13
+        audioop = None
+
+logger = logging.getLogger(__name__)
+
+# Длина кадра анализа и запас тишины, оставляемый вокруг речи (мс)
+FRAME_MS = 30
+PAD_MS = 200
+# Минимальная длительность речи, чтобы щелчки и стуки не считались ответом (мс)
+MIN_SPEECH_MS = 90
+# Порог речи (доля полной шкалы): уровень шума, умноженный на коэффициент,
+# но не ниже MIN_LEVEL и не выше MAX_LEVEL, чтобы не резать тихую речь
+NOISE_PERCENTILE = 0.1
+NOISE_FACTOR = 3.0
+MIN_LEVEL = 0.01
+MAX_LEVEL = 0.05
+
+
+def frame_levels(data, sample_width, frame_bytes):
+    """Уровень (RMS, доля полной шкалы) для каждого полного кадра PCM-данных"""
+    full_scale = float(2 ** (8 * sample_width - 1))
+    if audioop is not None:
+        return [
+            audioop.rms(data[i:i + frame_bytes], sample_width) / full_scale
+            for i in range(0, len(data) - frame_bytes + 1, frame_bytes)
+        ]
+
+    # Запасной вариант без audioop: только 16-битный звук, который пишет браузер
+    if sample_width != 2:
+        return None
+    samples = array('h')
+    samples.frombytes(data[:len(data) - len(data) % 2])
+    if sys.byteorder == 'big':
+        samples.byteswap()
+    step = frame_bytes // 2
+    levels = []
+    for i in range(0, len(samples) - step + 1, step):
+        chunk = samples[i:i + step]
+        levels.append(math.sqrt(sum(map(mul, chunk, chunk)) / step) / full_scale)
+    return levels
+
+
+def speech_bounds(levels, frame_ms=FRAME_MS, pad_ms=PAD_MS, min_speech_ms=MIN_SPEECH_MS):
+    """Границы речи в кадрах (начало, конец) с запасом или None, если речи нет"""
+    if not levels:
+        return None
+    noise = sorted(levels)[int(len(levels) * NOISE_PERCENTILE)]
+    threshold = min(max(noise * NOISE_FACTOR, MIN_LEVEL), MAX_LEVEL)
+    min_frames = max(1, min_speech_ms // frame_ms)
+
+    first = last = None
+    run = 0
+    for i, level in enumerate(levels):
+        run = run + 1 if level >= threshold else 0
+        if run >= min_frames:
+            if first is None:
+                first = i - run + 1
+            last = i + 1
+    if first is None:
+        return None
+
+    pad = pad_ms // frame_ms
+    return max(first - pad, 0), min(last + pad, len(levels))
+
+
+def trim_silence(path, frame_ms=FRAME_MS, pad_ms=PAD_MS):
+    """
+    Обрезает тишину в начале и в конце WAV-файла на месте.
+    Возвращает (исходная длительность, длительность речи) в секундах;
+    длительность речи 0 - в записи нет речи, файл не изменяется.
+    """
+    with wave.open(path, 'rb') as wav:
+        params = wav.getparams()
+        data = wav.readframes(params.nframes)
+
+    frame_size = params.sampwidth * params.nchannels
+    frame_bytes = frame_size * max(1, params.framerate * frame_ms // 1000)
+    duration = params.nframes / params.framerate if params.framerate else 0.0
+
+    levels = frame_levels(data, params.sampwidth, frame_bytes)
+    if levels is None:
+        return duration, duration
+
+    bounds = speech_bounds(levels, frame_ms, pad_ms)
+    if bounds is None:
+        return duration, 0.0
+
+    start = bounds[0] * frame_bytes
+    # Если речь доходит до последнего кадра, неполный хвост записи сохраняется
+    end = len(data) if bounds[1] == len(levels) else bounds[1] * frame_bytes
+    if start == 0 and end == len(data):
+        return duration, duration
+
+    tmp_path = f"{path}.tmp"
+    with wave.open(tmp_path, 'wb') as wav:
+        wav.setnchannels(params.nchannels)
+        wav.setsampwidth(params.sampwidth)
+        wav.setframerate(params.framerate)
+        wav.writeframes(data[start:end])
+    os.replace(tmp_path, path)
+
+    speech_duration = (end - start) / frame_size / params.framerate
+    logger.info(f"Тишина обрезана: {duration:.1f} с -> {speech_duration:.1f} с")
+    return duration, speech_duration